@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 from decouple import config
@@ -152,6 +153,18 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated"
     ],
+    # Picked by the Accept header (or ?format=json / ?format=msgpack)
+    "DEFAULT_RENDERER_CLASSES": [
+        "recipes.renderers.ORJSONRenderer",
+        "recipes.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    # Ingredient autocomplete, one request per keystroke
+    "DEFAULT_THROTTLE_RATES": {
+        "ingredient_autocomplete": config(
+            "INGREDIENT_AUTOCOMPLETE_RATE", default="120/minute"
+        ),
+    },
 }
 
 # CORS_ORIGIN_ALLOW_ALL = True
@@ -167,3 +180,108 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 OPENAI_API_KEY = config("OPENAI_API_KEY")
+
+# Load the NLP pipelines when the process starts. Only enable this for
+# workers that process uploads; plain API workers load them lazily.
+NLP_WARM_UP = config("NLP_WARM_UP", default=False, cast=bool)
+# Maximum time (ms) importing the API modules may take, checked by
+# `manage.py check_import_budget`.
+NLP_IMPORT_BUDGET_MS = config("NLP_IMPORT_BUDGET_MS", default=500, cast=int)
+
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Background jobs (recipe file uploads). Locally tasks run eagerly in the
+# request process; set CELERY_TASK_ALWAYS_EAGER=False and point the broker
+# at Redis/RabbitMQ to process them in `celery -A edu_gen_quizz worker`.
+CELERY_BROKER_URL = config("CELERY_BROKER_URL", default="memory://")
+CELERY_TASK_ALWAYS_EAGER = config(
+    "CELERY_TASK_ALWAYS_EAGER", default=True, cast=bool
+)
+CELERY_WORKER_CONCURRENCY = config(
+    "CELERY_WORKER_CONCURRENCY", default=2, cast=int
+)
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Long PDFs are extracted by a process pool when the whole document is
+# needed (e.g. cookbook uploads, from inside the extraction sandbox worker);
+# shorter ones serially.
+PDF_EXTRACTION_WORKERS = config(
+    "PDF_EXTRACTION_WORKERS", default=os.cpu_count() or 1, cast=int
+)
+PDF_PARALLEL_PAGE_THRESHOLD = config(
+    "PDF_PARALLEL_PAGE_THRESHOLD", default=50, cast=int
+)
+# Files of an uploaded ZIP archive processed at the same time (extraction
+# itself runs on the EXTRACTION_WORKERS sandbox processes below)
+ARCHIVE_UPLOAD_WORKERS = config(
+    "ARCHIVE_UPLOAD_WORKERS", default=os.cpu_count() or 1, cast=int
+)
+
+# Text extraction of uploaded files runs in sandboxed worker processes
+# (recipes.utils.extraction_sandbox) that are killed when a file takes too
+# long or too much memory, and recycled after a number of jobs.
+EXTRACTION_SANDBOX = config("EXTRACTION_SANDBOX", default=True, cast=bool)
+EXTRACTION_WORKERS = config("EXTRACTION_WORKERS", default=2, cast=int)
+EXTRACTION_TIMEOUT_SECONDS = config(
+    "EXTRACTION_TIMEOUT_SECONDS", default=30, cast=float
+)
+EXTRACTION_MEMORY_LIMIT_MB = config(
+    "EXTRACTION_MEMORY_LIMIT_MB", default=512, cast=int
+)
+EXTRACTION_MAX_JOBS_PER_WORKER = config(
+    "EXTRACTION_MAX_JOBS_PER_WORKER", default=50, cast=int
+)
+
+# Ingredient names are normalized with spaCy's nlp.pipe; more than one
+# process only pays off for large bulk re-parses.
+INGREDIENT_NORMALIZER_BATCH_SIZE = config(
+    "INGREDIENT_NORMALIZER_BATCH_SIZE", default=256, cast=int
+)
+INGREDIENT_NORMALIZER_PROCESSES = config(
+    "INGREDIENT_NORMALIZER_PROCESSES", default=1, cast=int
+)
+
+# Rendered responses of public recipe reads are cached under versioned keys
+# (recipes.response_cache). The local-memory cache is per process: use the
+# file or Redis backend when several processes serve the API, so they all
+# see the version bumps.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="cookhub"),
+    }
+}
+RESPONSE_CACHE_TIMEOUT = config(
+    "RESPONSE_CACHE_TIMEOUT", default=3600, cast=int
+)
+
+# NDJSON bulk imports (recipes.utils.recipe_import) save this many valid
+# recipes per transaction; only the current batch is kept in memory.
+RECIPE_IMPORT_BATCH_SIZE = config(
+    "RECIPE_IMPORT_BATCH_SIZE", default=500, cast=int
+)
+RECIPE_IMPORT_MAX_BATCH_SIZE = 5000
+# Recipes fetched, prefetched and encoded at a time by the streaming export
+# (recipes.utils.recipe_export)
+RECIPE_EXPORT_CHUNK_SIZE = config(
+    "RECIPE_EXPORT_CHUNK_SIZE", default=500, cast=int
+)
+
+# The unit conversion table and unit lexicon are built per process and
+# rebuilt when a unit changes in the process, or after this long for units
+# changed by other processes.
+UNIT_CACHE_MAX_AGE_SECONDS = config(
+    "UNIT_CACHE_MAX_AGE_SECONDS", default=3600, cast=int
+)
+
+# The ingredient autocomplete index (recipes.utils.ingredient_index) is
+# built per process and rebuilt after this long, so usage ranks and names
+# created by other processes catch up.
+INGREDIENT_INDEX_MAX_AGE_SECONDS = config(
+    "INGREDIENT_INDEX_MAX_AGE_SECONDS", default=3600, cast=int
+)
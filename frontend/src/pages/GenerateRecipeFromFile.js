@@ -3,8 +3,23 @@ import { Alert, Button, Container, Form } from "react-bootstrap";
 import { useNavigate } from "react-router-dom";
 import api from "../api";
 
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function waitForUploadJob(jobId) {
+	while (true) {
+		const { data: job } = await api.get(`/upload_jobs/${jobId}/`);
+		if (job.status === "done" || job.status === "failed") {
+			return job;
+		}
+		await sleep(POLL_INTERVAL_MS);
+	}
+}
+
 function GenerateRecipeFromFile() {
 	const [file, setFile] = useState(null);
+	const [multipleRecipes, setMultipleRecipes] = useState(false);
 	const [error, setError] = useState("");
 	const navigate = useNavigate();
 
@@ -17,14 +32,26 @@ function GenerateRecipeFromFile() {
 		const formData = new FormData();
 		formData.append("name", file.name);
 		formData.append("file", file);
+		formData.append("multiple_recipes", multipleRecipes);
 		try {
 			const response = await api.post("/upload/", formData, {
 				headers: { "Content-Type": "multipart/form-data" },
 			});
+			let job = response.data;
+			if (job.status !== "done" && job.status !== "failed") {
+				job = await waitForUploadJob(job.id);
+			}
+			if (job.status === "failed") {
+				setError(job.error || "Failed to process file.");
+				return;
+			}
 			alert("File uploaded successfully!");
 
-			const recipeId = response.data.recipe.id;
-			navigate(`/editRecipe/${recipeId}`);
+			if (job.recipe_ids.length > 1) {
+				navigate("/recipe_list");
+			} else {
+				navigate(`/editRecipe/${job.recipe}`);
+			}
 		} catch (err) {
 			console.error("Upload error:", err.response?.data || err.message);
 			let errorMsg = "Failed to upload file.";
@@ -58,6 +85,15 @@ function GenerateRecipeFromFile() {
 						onChange={(e) => setFile(e.target.files[0])}
 					/>
 				</Form.Group>
+				<Form.Group className="mb-3">
+					<Form.Check
+						id="multipleRecipesInput"
+						type="checkbox"
+						label="This file contains several recipes"
+						checked={multipleRecipes}
+						onChange={(e) => setMultipleRecipes(e.target.checked)}
+					/>
+				</Form.Group>
 				<Button variant="primary" type="submit">
 					Generate Recipe from file
 				</Button>
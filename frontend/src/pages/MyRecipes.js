@@ -5,6 +5,9 @@ import { Link } from "react-router-dom";
 import api from "../api";
 import RecipeFilter from "../components/RecipeFilter";
 
+// Only what the table shows
+const LIST_FIELDS = "id,title,description";
+
 function MyRecipes() {
 	const [recipes, setRecipes] = useState([]);
 	const [showDeleteModal, setShowDeleteModal] = useState(false);
@@ -14,12 +17,12 @@ function MyRecipes() {
 		const payload = { ...filters, my_recipes: true }; // flatten
 		if (payload.ingredients || payload.title || payload.creator) {
 			api
-				.post("/recommend_recipes_db/", payload)
+				.post(`/recommend_recipes_db/?fields=${LIST_FIELDS}`, payload)
 				.then((res) => setRecipes(res.data))
 				.catch((err) => console.error(err));
 		} else {
 			api
-				.get("/recipe_list/")
+				.get(`/recipe_list/?fields=${LIST_FIELDS}`)
 				.then((res) => setRecipes(res.data))
 				.catch((err) => console.error(err));
 		}
@@ -28,7 +31,7 @@ function MyRecipes() {
 	const handleSurpriseMe = (filtersWithNum) => {
 		const payload = { ...filtersWithNum, my_recipes: true };
 		api
-			.post("/recommend_recipes_db/", payload)
+			.post(`/recommend_recipes_db/?fields=${LIST_FIELDS}`, payload)
 			.then((res) => setRecipes(res.data))
 			.catch((err) => console.error(err));
 	};
@@ -39,7 +42,7 @@ function MyRecipes() {
 
 	useEffect(() => {
 		api
-			.get("/recipe_list/")
+			.get(`/recipe_list/?fields=${LIST_FIELDS}`)
 			.then((response) => {
 				setRecipes(response.data);
 			})
@@ -1,31 +1,56 @@
 import { useCallback, useEffect, useState } from "react";
+import Button from "react-bootstrap/Button";
 import Table from "react-bootstrap/Table";
 import { Link } from "react-router-dom";
 import api from "../api";
 import RecipeFilter from "../components/RecipeFilter";
 
+// Only what the table shows
+const LIST_FIELDS = "id,title,description";
+
 function PublicRecipes() {
 	const [recipes, setRecipes] = useState([]);
+	// Cursor URL of the next page of public recipes, if any
+	const [nextPage, setNextPage] = useState(null);
 
 	const fetchRecipes = useCallback((filters = {}) => {
 		const payload = { ...filters }; // flatten
 		if (payload.ingredients || payload.title || payload.creator) {
 			api
-				.post("/recommend_recipes_db/", payload)
-				.then((res) => setRecipes(res.data))
+				.post(`/recommend_recipes_db/?fields=${LIST_FIELDS}`, payload)
+				.then((res) => {
+					setRecipes(res.data);
+					setNextPage(null);
+				})
 				.catch((err) => console.error(err));
 		} else {
 			api
-				.get("/public_recipe_list/")
-				.then((res) => setRecipes(res.data))
+				.get(`/public_recipe_list/?fields=${LIST_FIELDS}`)
+				.then((res) => {
+					setRecipes(res.data.results);
+					setNextPage(res.data.next);
+				})
 				.catch((err) => console.error(err));
 		}
 	}, []);
 
+	const loadMore = () => {
+		api
+			.get(nextPage)
+			.then((res) => {
+				setRecipes((prev) => [...prev, ...res.data.results]);
+				setNextPage(res.data.next);
+			})
+			.catch((err) => console.error(err));
+	};
+
 	const handleSurpriseMe = (filtersWithNum) => {
 		api
-			.post("/recommend_recipes_db/", filtersWithNum)
-			.then((res) => setRecipes(res.data))
+			.post(`/recommend_recipes_db/?fields=${LIST_FIELDS}`, filtersWithNum)
+			.then((res) => {
+				setRecipes(res.data);
+				setNextPage(null);
+			})
 			.catch((err) => console.error(err));
 	};
 
@@ -62,6 +87,11 @@ function PublicRecipes() {
 					))}
 				</tbody>
 			</Table>
+			{nextPage && (
+				<Button variant="secondary" onClick={loadMore}>
+					Load more
+				</Button>
+			)}
 		</>
 	);
 }
@@ -18,7 +18,7 @@ function ViewRecipe() {
 		async (systemParam = system) => {
 			try {
 				const res = await api.get(
-					`/recipe_detail/${id}/?system=${systemParam}`,
+					`/public_recipe_detail/${id}/?system=${systemParam}`,
 				);
 				setRecipe(res.data);
 			} catch (err) {
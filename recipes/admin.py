@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import Ingredient, Recipe, RecipeIngredient, Step, Unit
+from .models import (
+    ArchiveImportJob,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Step,
+    Unit,
+    UploadJob,
+)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -32,3 +40,15 @@ class UnitAdmin(admin.ModelAdmin):
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ("recipe", "ingredient", "quantity", "unit")
+
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ("uploaded_file", "user", "status", "recipe", "created_at")
+    list_filter = ("status",)
+
+
+@admin.register(ArchiveImportJob)
+class ArchiveImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "created_at")
+    list_filter = ("status",)
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if getattr(settings, "NLP_WARM_UP", False):
+            from .utils.nlp_models import nlp_models
+
+            nlp_models.warm_up()
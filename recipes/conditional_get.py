@@ -0,0 +1,82 @@
+import hashlib
+from abc import ABC, abstractmethod
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+"""
+File used to answer conditional GETs (If-None-Match / If-Modified-Since)
+of recipe endpoints with a 304 after a single query on updated_at.
+
+recipes.signals touches Recipe.updated_at whenever one of its ingredients,
+steps or ratings changes, so updated_at covers every row a recipe
+representation is built from.
+"""
+
+
+class ConditionalGetMixin(ABC):
+    """
+    Add strong ETag and Last-Modified validators to GET responses. The
+    ETag hashes the request path (id, ?system=, sparse fields), the
+    renderer and the state returned by get_validator_state.
+    """
+
+    @abstractmethod
+    def get_validator_state(self):
+        """
+        Return (last modified datetime or None, state string), or None to
+        skip validation (e.g. the object doesn't exist).
+        """
+
+    def get(self, request, *args, **kwargs):
+        state = self.get_validator_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+
+        last_modified, token = state
+        raw = "|".join(
+            [request.get_full_path(), request.accepted_renderer.format, token]
+        )
+        etag = quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+        return response
+
+
+class ObjectConditionalGetMixin(ConditionalGetMixin):
+    def get_validator_state(self):
+        updated_at = (
+            self.get_queryset()
+            .filter(pk=self.kwargs["pk"])
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None
+        return updated_at, updated_at.isoformat()
+
+
+class ListConditionalGetMixin(ConditionalGetMixin):
+    """
+    Validate a list by the latest updated_at and the number of its rows,
+    which also changes when a row is deleted. Views provide
+    get_base_queryset, the list's rows without annotations or prefetches.
+    """
+
+    def get_validator_state(self):
+        state = self.get_base_queryset().aggregate(
+            last=Max("updated_at"), count=Count("id")
+        )
+        last = state["last"]
+        token = f"{last.isoformat() if last else ''}|{state['count']}"
+        return last, token
@@ -25,6 +25,10 @@ UNIT_SYNONYMS = {
 
 UNIVERSAL_UNITS = ["pcs"]
 
+RECIPE_FILE_EXTENSIONS = [".pdf", ".docx"]
+MAX_UPLOAD_SIZE = 15 * 1024 * 1024  # 15 MB
+MAX_ARCHIVE_UPLOAD_SIZE = 500 * 1024 * 1024  # 500 MB
+
 CATEGORIES = {
     "g": "weight",
     "kg": "weight",
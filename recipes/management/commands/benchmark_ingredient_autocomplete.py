@@ -0,0 +1,124 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient
+from recipes.utils.ingredient_index import IngredientIndex
+
+ADJECTIVES = [
+    "red",
+    "green",
+    "smoked",
+    "dried",
+    "fresh",
+    "ground",
+    "sweet",
+    "wild",
+    "pickled",
+    "roasted",
+]
+FOODS = [
+    "onion",
+    "pepper",
+    "tomato",
+    "garlic",
+    "paprika",
+    "basil",
+    "chili",
+    "lentil",
+    "mushroom",
+    "cabbage",
+]
+SYLLABLES = ["ka", "lo", "mi", "ra", "te", "su", "no", "vi", "da", "pe"]
+
+
+def _names(count, rng) -> list:
+    names = set()
+    while len(names) < count:
+        word = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        names.add(f"{rng.choice(ADJECTIVES)} {word} {rng.choice(FOODS)}")
+    return sorted(names)
+
+
+def _typo(name, rng) -> str:
+    i = rng.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2 :]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the in-memory ingredient autocomplete index against the "
+        "icontains query it replaced"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ingredients", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _time_queries(self, run, queries) -> float:
+        start = time.perf_counter()
+        for query in queries:
+            run(query)
+        return (time.perf_counter() - start) / len(queries)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        names = _names(options["ingredients"], rng)
+        sample = rng.sample(names, options["queries"])
+        # What a user has typed after a few keystrokes, and with a typo
+        prefixes = [name.split()[1][: rng.randint(1, 5)] for name in sample]
+        typos = [_typo(name.split()[1], rng) for name in sample]
+
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name) for name in names], batch_size=1000
+            )
+            index = IngredientIndex()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            index.search("")
+            build = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            icontains = self._time_queries(
+                lambda q: list(
+                    Ingredient.objects.filter(name__icontains=q).values_list(
+                        "id", "name"
+                    )[:5]
+                ),
+                prefixes,
+            )
+            prefix = self._time_queries(index.search, prefixes)
+            fuzzy = self._time_queries(index.search, typos)
+            found = sum(
+                any(name == sample[i] for _, name in index.search(q))
+                for i, q in enumerate(typos)
+            )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Built index of {len(names):,} ingredients in {build:.2f}s, "
+            f"peak {peak / 2**20:.0f} MiB."
+        )
+        for label, seconds in (
+            ("icontains query", icontains),
+            ("index prefix search", prefix),
+            ("index search with typo", fuzzy),
+        ):
+            self.stdout.write(
+                f"{label:<24}{seconds * 1e6:>10.1f} µs/query "
+                f"({icontains / seconds:.0f}x)"
+            )
+        self.stdout.write(
+            f"Typos matching the intended ingredient in the top 5: "
+            f"{found / len(typos):.0%}"
+        )
+        if prefix > icontains:
+            raise CommandError("The index is slower than icontains.")
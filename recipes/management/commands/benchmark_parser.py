@@ -0,0 +1,401 @@
+import gc
+import io
+import json
+import random
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import fitz
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Unit
+from recipes.utils.file_extraction import iter_text_from_file
+from recipes.utils.ingredient_normalization import normalize_parsed_recipes
+from recipes.utils.recipe_processing import (
+    parse_recipe_text,
+    persist_recipes,
+)
+from recipes.utils.recipe_segmentation import segment_recipes
+from recipes.utils.unit_lexicon import unit_lexicon
+
+BENCHMARKS_DIR = Path(__file__).resolve().parents[2] / "benchmarks"
+CORPUS_DIR = BENCHMARKS_DIR / "corpus"
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baselines.json"
+
+# Metrics that depend on the speed of the machine running the benchmark,
+# left out of the baseline. Throughput is stored relative to a reference
+# workload timed in the same run instead, so the checked-in baseline can
+# be compared on any machine.
+MACHINE_METRICS = ("seconds", "lines_per_sec", "recipes_per_sec")
+
+DOCX_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+    'wordprocessingml/2006/main"><w:body>{}</w:body></w:document>'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the recipe pipeline (extract, segment, parse, persist) "
+        "on the checked-in corpus plus generated recipes, and compare "
+        "the results against the stored baselines"
+    )
+
+    QUANTITIES = ["1", "2", "3", "1/2", "1 1/2", "250", "2-3", "½", "two"]
+    UNITS = ["g", "kg", "ml", "cups", "tbsp", "tsp", "pinch of", ""]
+    INGREDIENTS = [
+        "flour",
+        "sugar",
+        "butter, softened",
+        "eggs",
+        "milk",
+        "large onions, finely chopped",
+        "cloves garlic, minced",
+        "olive oil",
+        "chopped tomatoes",
+        "salt",
+        "black pepper",
+        "grated cheddar",
+        "chicken thighs",
+        "fresh basil",
+    ]
+    STEPS = [
+        "Preheat the oven and line a tray with baking paper.",
+        "Whisk the dry ingredients together in a large bowl.",
+        "Fry the onions in the oil until soft and golden.",
+        "Stir in the remaining ingredients and simmer for 20 minutes.",
+        "Season to taste, then leave to rest for five minutes.",
+        "Bake until golden and cooked through.",
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--synthetic-recipes",
+            type=int,
+            default=500,
+            help="Number of generated recipes added to the corpus.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed runs per stage, the fastest one is reported.",
+        )
+        parser.add_argument(
+            "--normalize",
+            action="store_true",
+            help="Include spaCy ingredient normalization in the parse stage.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(DEFAULT_BASELINE),
+            help="JSON file holding the baseline of every stage.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.7,
+            help=(
+                "Fail when a stage is slower than this fraction of its "
+                "baseline relative throughput, or uses more than its "
+                "baseline peak memory divided by this fraction."
+            ),
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Store this run as the new baseline instead of comparing.",
+        )
+
+    # Corpus
+
+    def _synthetic_recipe(self, rng, index):
+        lines = [f"Benchmark Recipe {index}", "A generated test recipe."]
+        lines.append("Ingredients")
+        for _ in range(rng.randint(3, 25)):
+            quantity = rng.choice(self.QUANTITIES)
+            unit = rng.choice(self.UNITS)
+            ingredient = rng.choice(self.INGREDIENTS)
+            parts = (quantity, unit, ingredient)
+            lines.append(" ".join(part for part in parts if part))
+        lines.append("Method")
+        for step in range(1, rng.randint(2, 15) + 1):
+            lines.append(f"{step}. {rng.choice(self.STEPS)}")
+        return "\n".join(lines)
+
+    def _corpus(self, synthetic_recipes, seed):
+        recipes = [
+            path.read_text(encoding="utf-8").strip()
+            for path in sorted(CORPUS_DIR.glob("*.txt"))
+        ]
+        rng = random.Random(seed)
+        recipes += [
+            self._synthetic_recipe(rng, index)
+            for index in range(1, synthetic_recipes + 1)
+        ]
+        return recipes
+
+    def _build_docx(self, recipes):
+        paragraphs = "".join(
+            f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}'
+            "</w:t></w:r></w:p>"
+            for recipe in recipes
+            for line in recipe.splitlines()
+        )
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(
+                "word/document.xml", DOCX_TEMPLATE.format(paragraphs)
+            )
+        return buffer.getvalue()
+
+    def _build_pdf(self, recipes):
+        # One page per recipe, like most printed cookbooks
+        document = fitz.open()
+        for recipe in recipes:
+            page = document.new_page()
+            page.insert_text((50, 50), recipe, fontsize=9)
+        data = document.tobytes()
+        document.close()
+        return data
+
+    # Stages
+
+    def _reference(self):
+        # Plain Python work over the corpus that none of the stages share,
+        # used to scale the stage throughputs to the machine speed
+        words = {}
+        for line in self.reference_text.splitlines():
+            for word in line.lower().split():
+                words[word] = words.get(word, 0) + 1
+        return sorted(words.items(), key=lambda item: (-item[1], item[0]))
+
+    def _extract(self, data, file_type):
+        return "".join(iter_text_from_file(io.BytesIO(data), file_type))
+
+    def _parse(self, segments, normalize):
+        parsed = []
+        for segment in segments:
+            try:
+                parsed.append(parse_recipe_text(segment, normalize=False))
+            except ValueError:
+                continue
+        if normalize:
+            normalize_parsed_recipes(parsed)
+        return parsed
+
+    def _persist(self, parsed):
+        # Rolled back, so every run starts from the same database
+        with transaction.atomic():
+            user = User.objects.create_user(username="benchmark-parser")
+            recipes = persist_recipes(parsed, user)
+            transaction.set_rollback(True)
+        return recipes
+
+    def _time(self, run):
+        # Like timeit, keep garbage collection out of the timings
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            return time.perf_counter() - start
+        finally:
+            gc.enable()
+
+    def _measure(self, run, repeat):
+        # The reference is timed between the runs of every stage, so both
+        # see the same load on the machine
+        timings, reference = [], []
+        for _ in range(repeat):
+            timings.append(self._time(run))
+            reference.append(self._time(self._reference))
+
+        # Memory and queries are traced in a separate run, tracemalloc
+        # slows everything down
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                result = run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result, min(timings), min(reference), peak, len(queries)
+
+    def _stage(self, name, run, lines, recipes, repeat):
+        result, seconds, reference, peak, queries = self._measure(run, repeat)
+        self.results[name] = {
+            "seconds": round(seconds, 4),
+            "lines_per_sec": round(lines / seconds, 1),
+            "recipes_per_sec": round(recipes / seconds, 1),
+            "relative_throughput": round(reference / seconds, 4),
+            "peak_memory_kb": round(peak / 1024, 1),
+            "queries": queries,
+            "recipes": recipes,
+        }
+        return result
+
+    # Reporting
+
+    def _report(self):
+        self.stdout.write(
+            f"{'stage':<13}{'lines/s':>13}{'recipes/s':>12}"
+            f"{'relative':>10}{'peak KB':>11}{'queries':>9}"
+        )
+        for name, stats in self.results.items():
+            self.stdout.write(
+                f"{name:<13}{stats['lines_per_sec']:>13,.0f}"
+                f"{stats['recipes_per_sec']:>12,.1f}"
+                f"{stats['relative_throughput']:>10,.3f}"
+                f"{stats['peak_memory_kb']:>11,.0f}{stats['queries']:>9}"
+            )
+
+    def _compare(self, baseline, threshold):
+        regressions = []
+        for name, stats in self.results.items():
+            expected = baseline["stages"].get(name)
+            if expected is None:
+                regressions.append(f"{name}: no baseline for this stage")
+                continue
+            if stats["queries"] > expected["queries"]:
+                regressions.append(
+                    f"{name}: {stats['queries']} queries, "
+                    f"baseline is {expected['queries']}"
+                )
+            if stats["recipes"] != expected["recipes"]:
+                regressions.append(
+                    f"{name}: {stats['recipes']} recipes, "
+                    f"baseline is {expected['recipes']}"
+                )
+            ratio = (
+                stats["relative_throughput"] / expected["relative_throughput"]
+            )
+            if ratio < threshold:
+                regressions.append(
+                    f"{name}: {ratio:.0%} of the baseline throughput"
+                )
+            peak = stats["peak_memory_kb"]
+            if peak * threshold > expected["peak_memory_kb"]:
+                regressions.append(
+                    f"{name}: peak memory {peak:.0f}KB, "
+                    f"baseline is {expected['peak_memory_kb']:.0f}KB"
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        if not Unit.objects.exists():
+            raise CommandError(
+                "No units found, run populate_measuring_units first."
+            )
+        # Built once up front so the parse stage never queries the units
+        unit_lexicon.fallback_unit
+
+        repeat = options["repeat"]
+        corpus = self._corpus(options["synthetic_recipes"], options["seed"])
+        corpus_info = {
+            "recipes": len(corpus),
+            "lines": sum(len(r.splitlines()) for r in corpus),
+            "seed": options["seed"],
+            "normalize": options["normalize"],
+        }
+        self.stdout.write(
+            f"Corpus: {corpus_info['recipes']} recipes, "
+            f"{corpus_info['lines']} lines."
+        )
+
+        self.results = {}
+        self.reference_text = "\n".join(corpus)
+        docx = self._build_docx(corpus)
+        pdf = self._build_pdf(corpus)
+        text = self._stage(
+            "extract_docx",
+            lambda: self._extract(docx, ".docx"),
+            corpus_info["lines"],
+            len(corpus),
+            repeat,
+        )
+        self._stage(
+            "extract_pdf",
+            lambda: self._extract(pdf, ".pdf"),
+            corpus_info["lines"],
+            len(corpus),
+            repeat,
+        )
+        segments = self._stage(
+            "segment",
+            lambda: list(segment_recipes([text])),
+            corpus_info["lines"],
+            len(corpus),
+            repeat,
+        )
+        parsed = self._stage(
+            "parse",
+            lambda: self._parse(segments, options["normalize"]),
+            corpus_info["lines"],
+            len(segments),
+            repeat,
+        )
+        self._stage(
+            "persist",
+            lambda: self._persist(parsed),
+            corpus_info["lines"],
+            len(parsed),
+            repeat,
+        )
+        self._report()
+
+        if len(segments) != len(corpus):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Segmentation found {len(segments)} recipes, "
+                    f"expected {len(corpus)}."
+                )
+            )
+
+        baseline_path = Path(options["baseline"])
+        if options["update_baseline"]:
+            stages = {
+                name: {
+                    metric: value
+                    for metric, value in stats.items()
+                    if metric not in MACHINE_METRICS
+                }
+                for name, stats in self.results.items()
+            }
+            baseline_path.write_text(
+                json.dumps({"corpus": corpus_info, "stages": stages}, indent=2)
+                + "\n"
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline written to {baseline_path}.")
+            )
+            return
+
+        if not baseline_path.exists():
+            raise CommandError(
+                f"No baseline at {baseline_path}, run with "
+                "--update-baseline to create one."
+            )
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline["corpus"] != corpus_info:
+            raise CommandError(
+                f"Baseline was recorded on a different corpus "
+                f"({baseline['corpus']}), use the same options."
+            )
+        regressions = self._compare(baseline, options["threshold"])
+        if regressions:
+            raise CommandError(
+                "Pipeline regressed:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(
+            self.style.SUCCESS("All stages are within the baseline.")
+        )
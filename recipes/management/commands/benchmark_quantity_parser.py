@@ -0,0 +1,110 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.utils.quantity_parsing import parse_quantity
+
+# The quantity parsing parse_ingredient_lines used before the compiled
+# grammar, kept as the benchmark reference.
+legacy_quantity_pattern = re.compile(r"^\d+([\/\.\d]*)?")
+legacy_number_word_pattern = re.compile(
+    r"\b(one|two|three|four|five|six|seven|eight|nine|ten)\b", re.I
+)
+
+
+def legacy_parse_quantity(lower_line):
+    match = legacy_quantity_pattern.match(lower_line)
+    if match:
+        q_str = match.group(0)
+        try:
+            quantity = float(eval(q_str))
+        except Exception:
+            quantity = 1.0
+        lower_line = lower_line[len(q_str) :].strip()
+    else:
+        word_match = legacy_number_word_pattern.search(lower_line)
+        if word_match:
+            word_to_num = {
+                "one": 1,
+                "two": 2,
+                "three": 3,
+                "four": 4,
+                "five": 5,
+                "six": 6,
+                "seven": 7,
+                "eight": 8,
+                "nine": 9,
+                "ten": 10,
+            }
+            quantity = word_to_num[word_match.group(1).lower()]
+            lower_line = lower_line.replace(word_match.group(0), "").strip()
+        else:
+            quantity = 1.0
+    return quantity, lower_line
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the compiled quantity grammar against the previous "
+        "eval based quantity parsing"
+    )
+
+    QUANTITIES = ["2", "1.5", "1/2", "3/4", "1 1/2", "250", "two", "ten", ""]
+    INGREDIENTS = [
+        "cups flour",
+        "tsp salt",
+        "tbsp olive oil",
+        "g butter",
+        "large onions, finely chopped",
+        "cloves garlic, minced",
+        "ml milk",
+        "eggs",
+        "pinch of pepper",
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lines",
+            type=int,
+            default=100_000,
+            help="Number of ingredient lines in the generated corpus.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _corpus(self, size, seed):
+        rng = random.Random(seed)
+        lines = []
+        for _ in range(size):
+            quantity = rng.choice(self.QUANTITIES)
+            ingredient = rng.choice(self.INGREDIENTS)
+            lines.append(f"{quantity} {ingredient}".strip())
+        return lines
+
+    def _time(self, parse, corpus):
+        start = time.perf_counter()
+        for line in corpus:
+            parse(line)
+        return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        corpus = self._corpus(options["lines"], options["seed"])
+
+        legacy = self._time(legacy_parse_quantity, corpus)
+        compiled = self._time(parse_quantity, corpus)
+
+        for label, seconds in (("legacy", legacy), ("compiled", compiled)):
+            self.stdout.write(
+                f"{label:>9}: {seconds:.3f}s "
+                f"({len(corpus) / seconds:,.0f} lines/s)"
+            )
+        speedup = legacy / compiled
+        if speedup < 1:
+            raise CommandError(
+                f"Compiled grammar is slower than the legacy path "
+                f"({speedup:.2f}x)."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Compiled grammar is {speedup:.1f}x faster.")
+        )
@@ -0,0 +1,178 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipePrivacyChoices,
+    Step,
+    Unit,
+)
+from recipes.renderers import MessagePackRenderer, ORJSONRenderer
+from recipes.serializers import (
+    FastRecipeSummarySerializer,
+    RecipeSummarySerializer,
+)
+from recipes.utils.recipe_queries import recipes_for_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark FastRecipeSummarySerializer and the orjson/MessagePack "
+        "renderers against the DRF serializers and JSONRenderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=10_000)
+        parser.add_argument("--ingredients", type=int, default=8)
+        parser.add_argument("--steps", type=int, default=6)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Timed runs per case, the fastest one is reported.",
+        )
+
+    def _create_recipes(self, options):
+        user = User.objects.create_user(username="benchmark-serializers")
+        unit = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=f"benchmark ingredient {i}")
+                for i in range(options["ingredients"])
+            ]
+        )
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    title=f"Benchmark recipe {i}",
+                    description="A generated recipe.",
+                    privacy=RecipePrivacyChoices.PUBLIC,
+                    user=user,
+                )
+                for i in range(options["recipes"])
+            ],
+            batch_size=1000,
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    quantity=1.5,
+                    unit=unit,
+                )
+                for recipe in recipes
+                for ingredient in ingredients
+            ],
+            batch_size=1000,
+        )
+        Step.objects.bulk_create(
+            [
+                Step(recipe=recipe, order=order, text="Stir and simmer.")
+                for recipe in recipes
+                for order in range(1, options["steps"] + 1)
+            ],
+            batch_size=1000,
+        )
+        return Recipe.objects.filter(user=user).order_by("id")
+
+    def _time(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - start)
+        return result, min(timings)
+
+    def _write(self, label, seconds, count, extra=""):
+        self.stdout.write(
+            f"{label:<28}{seconds:>8.3f}s {count / seconds:>12,.0f} "
+            f"recipes/s{extra}"
+        )
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        count = options["recipes"]
+        slower = []
+
+        with transaction.atomic():
+            queryset = self._create_recipes(options)
+
+            for label, expand in (
+                ("summary", ""),
+                ("full", "ingredients,steps"),
+            ):
+                request = Request(
+                    APIRequestFactory().get("/", {"expand": expand})
+                )
+                fields = RecipeSummarySerializer.requested_fields(request)
+                context = {"request": request}
+                drf_queryset = recipes_for_fields(queryset, fields)
+                fast_queryset = recipes_for_fields(
+                    queryset, fields, prefetch=False
+                )
+
+                drf_data, drf = self._time(
+                    lambda: RecipeSummarySerializer(
+                        drf_queryset.all(), many=True, context=context
+                    ).data,
+                    repeat,
+                )
+                fast_data, fast = self._time(
+                    lambda: FastRecipeSummarySerializer(
+                        fast_queryset.all(), context=context
+                    ).data,
+                    repeat,
+                )
+                if fast_data != drf_data:
+                    raise CommandError(
+                        f"Fast serializer output differs ({label})."
+                    )
+                self._write(f"{label} DRF serializer", drf, count)
+                self._write(
+                    f"{label} fast serializer",
+                    fast,
+                    count,
+                    f" ({drf / fast:.1f}x)",
+                )
+                if fast > drf:
+                    slower.append(f"{label} serializer")
+
+            transaction.set_rollback(True)
+
+        json_body, json_seconds = self._time(
+            lambda: JSONRenderer().render(fast_data), repeat
+        )
+        self._write(
+            "JSONRenderer", json_seconds, count, f" {len(json_body):,} bytes"
+        )
+        for renderer in (ORJSONRenderer(), MessagePackRenderer()):
+            body, seconds = self._time(
+                lambda: renderer.render(fast_data), repeat
+            )
+            self._write(
+                type(renderer).__name__,
+                seconds,
+                count,
+                f" {len(body):,} bytes ({json_seconds / seconds:.1f}x)",
+            )
+            if seconds > json_seconds:
+                slower.append(type(renderer).__name__)
+
+        if slower:
+            raise CommandError(
+                "Slower than the DRF classes: " + ", ".join(slower)
+            )
+        self.stdout.write(
+            self.style.SUCCESS("Fast serializer and renderers are faster.")
+        )
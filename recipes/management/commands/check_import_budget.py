@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so already imported modules don't hide cost.
+IMPORT_SCRIPT = """
+import json, sys, time
+import django
+django.setup()
+start = time.perf_counter()
+import recipes.serializers, recipes.views, recipes.urls
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [m for m in ("spacy",) if m in sys.modules]
+print(json.dumps({"elapsed_ms": elapsed, "heavy_modules": heavy}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that importing the API modules stays within the import "
+        "time budget and does not pull in the NLP libraries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget-ms",
+            type=int,
+            default=settings.NLP_IMPORT_BUDGET_MS,
+            help="Maximum allowed import time in milliseconds.",
+        )
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "NLP_WARM_UP": "False"},
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Import failed:\n{result.stderr}")
+
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        elapsed = report["elapsed_ms"]
+        if report["heavy_modules"]:
+            raise CommandError(
+                "API modules import NLP libraries at import time: "
+                f"{', '.join(report['heavy_modules'])}"
+            )
+        if elapsed > options["budget_ms"]:
+            raise CommandError(
+                f"Importing API modules took {elapsed:.0f}ms, "
+                f"budget is {options['budget_ms']}ms."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"API modules imported in {elapsed:.0f}ms "
+                f"(budget {options['budget_ms']}ms)."
+            )
+        )
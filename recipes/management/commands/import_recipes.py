@@ -0,0 +1,62 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.utils.recipe_import import import_recipe_lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Import recipes from a newline-delimited JSON file, one recipe per "
+        "line in the RecipeSerializer shape"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or - for stdin.")
+        parser.add_argument(
+            "--user", required=True, help="Username owning the recipes."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RECIPE_IMPORT_BATCH_SIZE,
+            help="Recipes saved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']}.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        if options["path"] == "-":
+            report = import_recipe_lines(
+                sys.stdin.buffer, user, options["batch_size"]
+            )
+        else:
+            try:
+                with open(options["path"], "rb") as lines:
+                    report = import_recipe_lines(
+                        lines, user, options["batch_size"]
+                    )
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        if report["failed"] > len(report["errors"]):
+            self.stderr.write(
+                f"... {report['failed'] - len(report['errors'])} more "
+                "invalid lines."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['created']} recipes, {report['failed']} "
+                f"invalid lines, in {report['seconds']}s "
+                f"({report['recipes_per_second']} recipes/s)."
+            )
+        )
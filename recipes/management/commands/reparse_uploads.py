@@ -0,0 +1,213 @@
+import difflib
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import UploadedFile
+from recipes.tasks import parse_uploaded_file
+from recipes.utils.ingredient_normalization import normalize_parsed_recipes
+from recipes.utils.parse_workers import init_worker, reparse_text
+from recipes.utils.unit_lexicon import unit_lexicon
+
+DEFAULT_CHECKPOINT = "reparse_uploads.checkpoint.json"
+
+
+def _multiple_recipes(uploaded_file) -> bool:
+    return (uploaded_file.parse_result or {}).get("multiple_recipes", False)
+
+
+def _reextract(uploaded_file):
+    try:
+        return (
+            *parse_uploaded_file(
+                uploaded_file,
+                _multiple_recipes(uploaded_file),
+                # Names are normalized for the whole batch at once
+                normalize=False,
+            ),
+            None,
+        )
+    except Exception as exc:
+        return None, None, str(exc)
+
+
+def _dump(parse_result) -> list:
+    return json.dumps(parse_result, indent=1, sort_keys=True).splitlines()
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse existing uploads again with the current parser, updating "
+        "their stored extraction and parse results"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reextract",
+            action="store_true",
+            help=(
+                "Extract the text of every file again in the extraction "
+                "sandbox, instead of re-parsing the stored text."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show what would change without saving anything.",
+        )
+        parser.add_argument(
+            "--max-diffs",
+            type=int,
+            default=20,
+            help="Number of changed files whose diff is shown on a dry run.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Files processed and saved per transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.ARCHIVE_UPLOAD_WORKERS,
+            help=(
+                "Files processed concurrently. With a single worker the "
+                "files are parsed in this process."
+            ),
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=DEFAULT_CHECKPOINT,
+            help="File recording the last saved upload, used by --resume.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue after the upload recorded in the checkpoint.",
+        )
+
+    def _load_checkpoint(self, path: Path) -> dict:
+        if not path.exists():
+            raise CommandError(f"No checkpoint found at {path}.")
+        return json.loads(path.read_text())
+
+    def _show_diff(self, uploaded_file, new_result):
+        diff = difflib.unified_diff(
+            _dump(uploaded_file.parse_result),
+            _dump(new_result),
+            fromfile=f"{uploaded_file.pk} {uploaded_file.name} (stored)",
+            tofile=f"{uploaded_file.pk} {uploaded_file.name} (re-parsed)",
+            lineterm="",
+        )
+        self.stdout.write("\n".join(diff))
+
+    def _process_batch(self, executor, batch, options):
+        """
+        Re-parse a batch of uploads and save the ones whose results
+        changed in a single transaction.
+        """
+        if options["reextract"]:
+            results = executor.map(_reextract, batch)
+        else:
+            results = executor.map(
+                reparse_text,
+                [uploaded_file.extracted_text for uploaded_file in batch],
+                [_multiple_recipes(uploaded_file) for uploaded_file in batch],
+                chunksize=max(1, len(batch) // (options["workers"] * 4)),
+            )
+        results = list(zip(batch, results))
+        normalize_parsed_recipes(
+            parsed
+            for _, (_, parse_result, _) in results
+            if parse_result is not None
+            for parsed in parse_result["recipes"]
+        )
+
+        changed = []
+        for uploaded_file, (extracted_text, parse_result, error) in results:
+            if error is not None:
+                self.failed += 1
+                self.stderr.write(f"Upload {uploaded_file.pk}: {error}")
+                continue
+            if (
+                parse_result == uploaded_file.parse_result
+                and extracted_text == uploaded_file.extracted_text
+            ):
+                continue
+            if options["dry_run"] and self.changed < options["max_diffs"]:
+                self._show_diff(uploaded_file, parse_result)
+            self.changed += 1
+            uploaded_file.extracted_text = extracted_text
+            uploaded_file.parse_result = parse_result
+            changed.append(uploaded_file)
+
+        if changed and not options["dry_run"]:
+            with transaction.atomic():
+                UploadedFile.objects.bulk_update(
+                    changed, ["extracted_text", "parse_result"]
+                )
+        self.processed += len(batch)
+
+    def _report(self, start, total):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{self.processed}/{total} uploads, {self.changed} changed, "
+            f"{self.failed} failed in {elapsed:.1f}s "
+            f"({self.processed / elapsed:.1f} files/s)"
+        )
+
+    def handle(self, *args, **options):
+        checkpoint_path = Path(options["checkpoint"])
+        last_pk = 0
+        if options["resume"]:
+            last_pk = self._load_checkpoint(checkpoint_path)["last_pk"]
+            self.stdout.write(f"Resuming after upload {last_pk}.")
+
+        uploads = UploadedFile.objects.filter(pk__gt=last_pk).order_by("pk")
+        if not options["reextract"]:
+            uploads = uploads.exclude(extracted_text="")
+        uploads = uploads.only(
+            "pk", "name", "file", "file_type", "extracted_text", "parse_result"
+        )
+        total = uploads.count()
+        self.stdout.write(f"Re-parsing {total} uploads.")
+
+        if options["reextract"] or options["workers"] == 1:
+            # Mostly waiting on the extraction sandbox, or a single worker
+            # not worth spawning a process for. Load the units once here,
+            # so the threads never open DB connections
+            unit_lexicon.fallback_unit
+            executor = ThreadPoolExecutor(max_workers=options["workers"])
+        else:
+            # Parsing is pure-Python CPU work, threads would share the GIL
+            executor = ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        self.processed = self.changed = self.failed = 0
+        start = time.perf_counter()
+        rows = uploads.iterator(chunk_size=options["batch_size"])
+        with executor:
+            while batch := list(islice(rows, options["batch_size"])):
+                self._process_batch(executor, batch, options)
+                if not options["dry_run"]:
+                    checkpoint_path.write_text(
+                        json.dumps({"last_pk": batch[-1].pk}) + "\n"
+                    )
+                self._report(start, total)
+
+        if options["dry_run"]:
+            self.stdout.write(f"Dry run: {self.changed} uploads would change.")
+        elif checkpoint_path.exists():
+            # Finished, nothing left to resume
+            checkpoint_path.unlink()
+        self.stdout.write(self.style.SUCCESS("Done."))
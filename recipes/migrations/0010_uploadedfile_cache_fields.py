@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0009_uploadjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadedfile",
+            name="sha256",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="uploadedfile",
+            name="extracted_text",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="uploadedfile",
+            name="parse_result",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="uploadjob",
+            name="cache_hit",
+            field=models.BooleanField(default=False),
+        ),
+    ]
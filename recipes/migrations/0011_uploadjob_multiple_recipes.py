@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0010_uploadedfile_cache_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadjob",
+            name="multiple_recipes",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="uploadjob",
+            name="recipe_ids",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
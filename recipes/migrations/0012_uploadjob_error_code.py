@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0011_uploadjob_multiple_recipes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadjob",
+            name="error_code",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0012_uploadjob_error_code"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["privacy", "-created_at", "-id"],
+                name="recipe_privacy_created_idx",
+            ),
+        ),
+    ]
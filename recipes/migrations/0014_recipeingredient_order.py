@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0013_recipe_recipe_privacy_created_idx"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="recipeingredient",
+            options={"ordering": ["order", "id"]},
+        ),
+        migrations.AlterModelOptions(
+            name="step",
+            options={"ordering": ["order", "id"]},
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="order",
+            field=models.IntegerField(default=0),
+        ),
+    ]
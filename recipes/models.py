@@ -13,6 +13,13 @@ class RecipePrivacyChoices(TextChoices):
     PUBLIC = "public", "Anyone can see this"
 
 
+class UploadJobStatusChoices(TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
+
+
 class Unit(models.Model):
     name = models.CharField(max_length=50)
     abbreviation = models.CharField(max_length=10)
@@ -59,6 +66,16 @@ class Recipe(UserFK, CreatedUpdatedAt, models.Model):
         through="RecipeIngredient",
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of public recipes, see
+            # recipes.pagination.CreatedAtCursorPagination
+            models.Index(
+                fields=["privacy", "-created_at", "-id"],
+                name="recipe_privacy_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -72,6 +89,12 @@ class RecipeIngredient(models.Model):
     quantity = models.FloatField()
     unit = models.ForeignKey(to=Unit, on_delete=models.CASCADE)
     is_optional = models.BooleanField(default=False)
+    # Position in the recipe. Rows saved before it existed are all 0 and
+    # keep their id order.
+    order = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["order", "id"]
 
     def __str__(self):
         opt = " (optional)" if self.is_optional else ""
@@ -88,6 +111,9 @@ class Step(models.Model):
     order = models.IntegerField()
     text = models.TextField()
 
+    class Meta:
+        ordering = ["order", "id"]
+
     def __str__(self):
         return f"Step {self.order} for {self.recipe.title}"
 
@@ -97,6 +123,11 @@ class UploadedFile(models.Model):
     file = models.FileField(upload_to="uploads/")
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file_type = models.CharField(max_length=10, blank=True)
+    # SHA-256 of the file bytes, used to reuse the results below when the
+    # same file is uploaded again
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    extracted_text = models.TextField(blank=True)
+    parse_result = models.JSONField(blank=True, null=True)
 
     def save(self, *args, **kwargs):
         # Detect extension automatically
@@ -125,3 +156,60 @@ class RecipeRating(UserFK, CreatedUpdatedAt, models.Model):
 
     class Meta:
         unique_together = ("user", "recipe")
+
+
+class UploadJob(UserFK, CreatedUpdatedAt, models.Model):
+    uploaded_file = models.ForeignKey(
+        UploadedFile, on_delete=models.CASCADE, related_name="jobs"
+    )
+    privacy = models.CharField(
+        max_length=50,
+        choices=RecipePrivacyChoices.choices,
+        default=RecipePrivacyChoices.PRIVATE,
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=UploadJobStatusChoices.choices,
+        default=UploadJobStatusChoices.QUEUED,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="upload_jobs",
+    )
+    error = models.TextField(blank=True)
+    # Why the job failed, see recipes.utils.file_extraction.ExtractionError
+    error_code = models.CharField(max_length=50, blank=True)
+    # Split the file into several recipes (e.g. a cookbook)
+    multiple_recipes = models.BooleanField(default=False)
+    recipe_ids = models.JSONField(default=list, blank=True)
+    # Whether the parse result of an identical earlier upload was reused
+    cache_hit = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Upload job {self.pk} ({self.status})"
+
+
+class ArchiveImportJob(UserFK, CreatedUpdatedAt, models.Model):
+    # Deleted once imported, see recipes.tasks.process_archive_import_job
+    archive = models.FileField(upload_to="archives/", blank=True)
+    privacy = models.CharField(
+        max_length=50,
+        choices=RecipePrivacyChoices.choices,
+        default=RecipePrivacyChoices.PRIVATE,
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=UploadJobStatusChoices.choices,
+        default=UploadJobStatusChoices.QUEUED,
+    )
+    # Why the archive could not be read at all; files that failed on their
+    # own are listed in the report
+    error = models.TextField(blank=True)
+    # Per-file results and throughput, see import_recipe_archive
+    report = models.JSONField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Archive import job {self.pk} ({self.status})"
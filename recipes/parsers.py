@@ -0,0 +1,14 @@
+from rest_framework.parsers import JSONParser
+
+"""
+File used to keep request parsers beyond DRF's defaults.
+"""
+
+
+class JSONPatchParser(JSONParser):
+    """
+    Parses RFC 6902 patch documents, applied by
+    recipes.utils.recipe_patch.
+    """
+
+    media_type = "application/json-patch+json"
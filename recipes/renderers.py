@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+import msgpack
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+"""
+File used to keep the response renderers picked by content negotiation:
+orjson for application/json and MessagePack for application/msgpack.
+"""
+
+
+def _default(value):
+    # Types neither library handles natively
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Promise):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(
+            data, default=_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
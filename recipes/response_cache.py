@@ -0,0 +1,163 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+"""
+File used to keep the cache of rendered public recipe responses.
+
+Response keys embed version tokens: one for every recipe, one for the
+public list and a global one for data shared by all recipes (units,
+ingredient names). Changing a recipe replaces its token (see
+recipes.signals), so responses built from the old data are never read
+again and simply expire.
+"""
+
+GLOBAL_VERSION_KEY = "recipe_responses:version"
+PUBLIC_LIST_VERSION_KEY = "public_recipe_list:version"
+STATS_KEY = "response_cache:{name}:{outcome}"
+# Validators set by recipes.conditional_get, kept with the cached body
+CACHED_HEADERS = ("ETag", "Last-Modified")
+
+
+def recipe_version_key(recipe_id) -> str:
+    return f"recipe:{recipe_id}:version"
+
+
+def get_versions(keys) -> list:
+    """
+    Return the version token stored under each key, creating the missing
+    ones.
+    """
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    for key, version in missing.items():
+        # Another process may have created it meanwhile
+        cache.add(key, version, timeout=None)
+    if missing:
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key, missing.get(key)) for key in keys]
+
+
+def _bump(keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+
+def bump_recipe_versions(recipe_ids):
+    """
+    Invalidate the cached responses of the given recipes and of the public
+    list, once the current transaction commits. Call this after bulk
+    operations, which don't send the signals recipes.signals listens to.
+    """
+    keys = [recipe_version_key(pk) for pk in set(recipe_ids)]
+    keys.append(PUBLIC_LIST_VERSION_KEY)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def bump_global_version():
+    transaction.on_commit(lambda: _bump([GLOBAL_VERSION_KEY]))
+
+
+def _record(name: str, outcome: str):
+    key = STATS_KEY.format(name=name, outcome=outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.add(key, 1, timeout=None)
+
+
+def response_cache_stats(names) -> dict:
+    stats = {}
+    for name in names:
+        hits = cache.get(STATS_KEY.format(name=name, outcome="hit"), 0)
+        misses = cache.get(STATS_KEY.format(name=name, outcome="miss"), 0)
+        total = hits + misses
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0,
+        }
+    return stats
+
+
+class VersionedResponseCacheMixin:
+    """
+    Serve GET requests of a view from the cache while the versions returned
+    by get_response_cache_version_keys are unchanged, without touching the
+    ORM or the serializers. Only 200 responses are stored, with their
+    validators, so conditional GETs are answered from the cache as well.
+    """
+
+    response_cache_name = None
+    # Query parameters that change the response. Others (tracking tags,
+    # cache busters) share the cached response of the same URL without them.
+    response_cache_query_params = ()
+
+    def get_response_cache_version_keys(self) -> list:
+        return [GLOBAL_VERSION_KEY]
+
+    def get_response_cache_key(self, request) -> str:
+        versions = get_versions(self.get_response_cache_version_keys())
+        params = [
+            f"{name}={value}"
+            for name in self.response_cache_query_params
+            for value in request.query_params.getlist(name)
+        ]
+        # The path holds the recipe id
+        raw = "|".join(
+            [
+                request.path,
+                *params,
+                request.accepted_renderer.format,
+                *versions,
+            ]
+        )
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f"response:{self.response_cache_name}:{digest}"
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _record(self.response_cache_name, "hit")
+            content, content_type, headers = cached
+            response = HttpResponse(content, content_type=content_type)
+            for header, value in headers.items():
+                response[header] = value
+            response["X-Response-Cache"] = "hit"
+            return get_conditional_response(
+                request,
+                etag=headers.get("ETag"),
+                last_modified=parse_http_date_safe(
+                    headers.get("Last-Modified")
+                ),
+                response=response,
+            )
+
+        _record(self.response_cache_name, "miss")
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key,
+                    (
+                        rendered.content,
+                        rendered["Content-Type"],
+                        {
+                            header: rendered[header]
+                            for header in CACHED_HEADERS
+                            if rendered.has_header(header)
+                        },
+                    ),
+                    timeout=settings.RESPONSE_CACHE_TIMEOUT,
+                )
+            )
+        response["X-Response-Cache"] = "miss"
+        return response
@@ -1,8 +1,17 @@
 import os
+import zipfile
+from collections import defaultdict
 
+from django.db import transaction
 from rest_framework import serializers
 
+from recipes.constants import (
+    MAX_ARCHIVE_UPLOAD_SIZE,
+    MAX_UPLOAD_SIZE,
+    RECIPE_FILE_EXTENSIONS,
+)
 from recipes.models import (
+    ArchiveImportJob,
     Ingredient,
     Recipe,
     RecipeIngredient,
@@ -10,17 +19,84 @@ from recipes.models import (
     Step,
     Unit,
     UploadedFile,
+    UploadJob,
+)
+from recipes.utils.recipe_processing import (
+    convert_unit,
+    get_or_create_ingredients,
 )
-from recipes.utils.recipe_processing import convert_unit
 
 
-class IngredientSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Ingredient
-        fields = ["id", "name"]
+def _split_param(value) -> list:
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients pick the fields of a serializer with ?fields=id,title and
+    add fields to the defaults with ?expand=steps. Meta.default_fields is
+    what is sent when neither is given (every field if unset).
+    """
+
+    @classmethod
+    def requested_fields(cls, request) -> list:
+        declared = list(cls.Meta.fields)
+        params = getattr(request, "query_params", {})
+        fields = _split_param(params.get("fields")) or getattr(
+            cls.Meta, "default_fields", declared
+        )
+        expand = _split_param(params.get("expand"))
+        return [name for name in declared if name in fields or name in expand]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get("request"))
+        for name in set(self.fields) - set(requested):
+            self.fields.pop(name)
+
+
+def _sync_rows(model, existing, incoming, key, fields):
+    """
+    Make the rows of `existing` match the unsaved `incoming` instances with
+    the fewest writes. Rows are paired by `key` first and then by position,
+    so an edited row keeps its primary key; `fields` must include the
+    model's order field, since a reused row may move. Only pairs that
+    differ in one of `fields` are updated; unpaired rows are inserted or
+    deleted.
+    """
+    existing = list(existing)
+    attnames = [model._meta.get_field(name).attname for name in fields]
+    by_key = defaultdict(list)
+    for row in existing:
+        by_key[getattr(row, key)].append(row)
+
+    pairs, unpaired = [], []
+    for row in incoming:
+        same_key = by_key.get(getattr(row, key))
+        if same_key:
+            pairs.append((same_key.pop(0), row))
+        else:
+            unpaired.append(row)
+    paired = {old.pk for old, _ in pairs}
+    leftover = [row for row in existing if row.pk not in paired]
+    pairs += zip(leftover, unpaired)
+
+    changed = []
+    for old, new in pairs:
+        if any(getattr(old, name) != getattr(new, name) for name in attnames):
+            for name in attnames:
+                setattr(old, name, getattr(new, name))
+            changed.append(old)
+    if changed:
+        model.objects.bulk_update(changed, fields)
+    if len(leftover) > len(unpaired):
+        stale = [row.pk for row in leftover[len(unpaired) :]]
+        model.objects.filter(pk__in=stale).delete()
+    if len(unpaired) > len(leftover):
+        model.objects.bulk_create(unpaired[len(leftover) :])
 
 
-class IngredientAutocompleteSerializer(serializers.ModelSerializer):
+class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ["id", "name"]
@@ -113,7 +189,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop("recipe_ingredients")
         recipe = Recipe.objects.create(**validated_data)
 
-        for ing_data in ingredients_data:
+        for order, ing_data in enumerate(ingredients_data, start=1):
             ingredient_name = ing_data.pop("ingredient_name")
             ingredient_obj, _ = Ingredient.objects.get_or_create(
                 name=ingredient_name
@@ -126,6 +202,7 @@ class RecipeSerializer(serializers.ModelSerializer):
                 recipe=recipe,
                 ingredient=ingredient_obj,
                 unit=unit_obj,
+                order=order,
                 **ing_data,
             )
         for step_data in steps_data:
@@ -134,32 +211,53 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     def update(self, instance, validated_data):
-        steps_data = validated_data.pop("steps", [])
-        ingredients_data = validated_data.pop("recipe_ingredients", [])
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        instance.recipe_ingredients.all().delete()
-        for ing_data in ingredients_data:
-            ingredient_name = ing_data.pop("ingredient_name")
-            ingredient_obj, _ = Ingredient.objects.get_or_create(
-                name=ingredient_name
-            )
-            unit_obj = ing_data.pop("unit_id")
-            ing_data.pop("unit", None)
-            RecipeIngredient.objects.create(
-                recipe=instance,
-                ingredient=ingredient_obj,
-                unit=unit_obj,
-                **ing_data,
-            )
-
-        instance.steps.all().delete()
-        for i, step_data in enumerate(steps_data):
-            step_data.pop("order", None)
-            Step.objects.create(recipe=instance, order=i + 1, **step_data)
+        # A list left out of a partial update is kept as it is
+        steps_data = validated_data.pop("steps", None)
+        ingredients_data = validated_data.pop("recipe_ingredients", None)
+
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            # Also touches updated_at and invalidates the cached responses
+            # (see recipes.signals), which the bulk queries below don't
+            instance.save()
+
+            if ingredients_data is not None:
+                ingredients = get_or_create_ingredients(
+                    ing_data["ingredient_name"]
+                    for ing_data in ingredients_data
+                )
+                _sync_rows(
+                    RecipeIngredient,
+                    instance.recipe_ingredients.order_by("order", "id"),
+                    [
+                        RecipeIngredient(
+                            recipe=instance,
+                            order=order,
+                            ingredient=ingredients[
+                                ing_data["ingredient_name"]
+                            ],
+                            quantity=ing_data["quantity"],
+                            unit=ing_data["unit_id"],
+                        )
+                        for order, ing_data in enumerate(
+                            ingredients_data, start=1
+                        )
+                    ],
+                    key="ingredient_id",
+                    fields=["order", "ingredient", "quantity", "unit"],
+                )
+            if steps_data is not None:
+                _sync_rows(
+                    Step,
+                    instance.steps.order_by("order", "id"),
+                    [
+                        Step(recipe=instance, order=i, text=step_data["text"])
+                        for i, step_data in enumerate(steps_data, start=1)
+                    ],
+                    key="text",
+                    fields=["order", "text"],
+                )
 
         return instance
 
@@ -182,7 +280,34 @@ class RecipeSerializer(serializers.ModelSerializer):
         return ingredients
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeIngredientImportSerializer(RecipeIngredientSerializer):
+    """
+    Checks unit_id against context["unit_ids"] instead of one query per
+    ingredient, and leaves it as an id.
+    """
+
+    unit_id = serializers.IntegerField(write_only=True)
+
+    def validate_unit_id(self, value):
+        if value not in self.context["unit_ids"]:
+            raise serializers.ValidationError(
+                f'Invalid pk "{value}" - object does not exist.'
+            )
+        return value
+
+
+class RecipeImportSerializer(RecipeSerializer):
+    """
+    Validates one line of an NDJSON import (see
+    recipes.utils.recipe_import, which saves the recipes in bulk).
+    """
+
+    ingredients = RecipeIngredientImportSerializer(
+        many=True, source="recipe_ingredients"
+    )
+
+
+class RecipeReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     steps = StepSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientReadSerializer(
         many=True, source="recipe_ingredients", read_only=True
@@ -201,21 +326,130 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeSummarySerializer(RecipeReadSerializer):
+    """
+    Recipe representation for list screens. Both aggregates are annotated
+    by recipes.utils.recipe_queries.recipes_for_fields; ingredients and
+    steps are only sent with ?expand= or ?fields=.
+    """
+
+    ingredient_count = serializers.IntegerField(read_only=True)
+    avg_rating = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + [
+            "ingredient_count",
+            "avg_rating",
+        ]
+        default_fields = [
+            "id",
+            "title",
+            "servings",
+            "ingredient_count",
+            "avg_rating",
+        ]
+
+
+# Columns read for each nested row, and the keys they are sent under
+INGREDIENT_ROW_COLUMNS = (
+    "id",
+    "ingredient__name",
+    "quantity",
+    "unit__abbreviation",
+    "unit_id",
+)
+INGREDIENT_ROW_KEYS = ("id", "ingredient", "quantity", "unit", "unit_id")
+STEP_ROW_COLUMNS = ("id", "order", "text")
+STEP_ROW_KEYS = ("id", "order", "text")
+
+
+def _nested_rows(model, recipe_ids, columns, keys) -> dict:
+    rows = defaultdict(list)
+    for recipe_id, *values in (
+        model.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("recipe_id", "order", "id")
+        .values_list("recipe_id", *columns)
+    ):
+        rows[recipe_id].append(dict(zip(keys, values)))
+    return rows
+
+
+class FastRecipeSummarySerializer:
+    """
+    Read-only stand-in for RecipeSummarySerializer(many=True) on list
+    endpoints, giving the same output without DRF's per-field machinery.
+    Recipes are read from a queryset's values_list() rows (or from the
+    instances of an already fetched page), and ingredients and steps with
+    one values_list() query each, so the queryset needs no prefetching
+    (see recipes_for_fields(prefetch=False)).
+    """
+
+    def __init__(self, instance=None, many=True, context=None, **kwargs):
+        self.instance = instance
+        self.context = context or {}
+
+    @classmethod
+    def requested_fields(cls, request) -> list:
+        return RecipeSummarySerializer.requested_fields(request)
+
+    def _recipe_rows(self, columns) -> list:
+        if isinstance(self.instance, (list, tuple)):
+            return [
+                tuple(getattr(recipe, column) for column in columns)
+                for recipe in self.instance
+            ]
+        return list(self.instance.prefetch_related(None).values_list(*columns))
+
+    @property
+    def data(self) -> list:
+        fields = self.requested_fields(self.context.get("request"))
+        columns = ["id"] + [
+            name
+            for name in fields
+            if name not in ("id", "ingredients", "steps")
+        ]
+        recipes = [
+            dict(zip(columns, row)) for row in self._recipe_rows(columns)
+        ]
+
+        recipe_ids = [recipe["id"] for recipe in recipes]
+        nested = {}
+        if "ingredients" in fields:
+            nested["ingredients"] = _nested_rows(
+                RecipeIngredient,
+                recipe_ids,
+                INGREDIENT_ROW_COLUMNS,
+                INGREDIENT_ROW_KEYS,
+            )
+        if "steps" in fields:
+            nested["steps"] = _nested_rows(
+                Step, recipe_ids, STEP_ROW_COLUMNS, STEP_ROW_KEYS
+            )
+
+        for recipe in recipes:
+            for name, rows in nested.items():
+                recipe[name] = rows[recipe["id"]]
+            if recipe.get("avg_rating") is not None:
+                # Some databases average integers into Decimal
+                recipe["avg_rating"] = float(recipe["avg_rating"])
+        # Same fields, in the same order, as RecipeSummarySerializer
+        return [{name: recipe[name] for name in fields} for recipe in recipes]
+
+
 class RecipeUploadSerializer(serializers.ModelSerializer):
     name = serializers.CharField(max_length=255)
     file = serializers.FileField()
+    multiple_recipes = serializers.BooleanField(default=False, write_only=True)
 
     class Meta:
         model = UploadedFile
-        fields = ["name", "file"]
+        fields = ["name", "file", "multiple_recipes"]
 
     def validate_file(self, file):
-        allowed_extensions = [".pdf", ".docx"]
         ext = os.path.splitext(file.name)[1].lower()
-        if ext not in allowed_extensions:
+        if ext not in RECIPE_FILE_EXTENSIONS:
             raise serializers.ValidationError("Unsupported file extension.")
-        max_size = 15 * 1024 * 1024  # 15 MB
-        if file.size > max_size:
+        if file.size > MAX_UPLOAD_SIZE:
             raise serializers.ValidationError(
                 "File too large. Max size is 15MB."
             )
@@ -225,6 +459,58 @@ class RecipeUploadSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class RecipeArchiveUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+    def validate_file(self, file):
+        ext = os.path.splitext(file.name)[1].lower()
+        if ext != ".zip":
+            raise serializers.ValidationError("Upload a .zip archive.")
+        if file.size > MAX_ARCHIVE_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                "Archive too large. Max size is 500MB."
+            )
+        # Only the central directory is read, members are read by the job
+        is_zip = zipfile.is_zipfile(file)
+        file.seek(0)
+        if not is_zip:
+            raise serializers.ValidationError("File is not a ZIP archive.")
+        return file
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadJob
+        fields = [
+            "id",
+            "status",
+            "recipe",
+            "recipe_ids",
+            "multiple_recipes",
+            "error",
+            "error_code",
+            "cache_hit",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class ArchiveImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchiveImportJob
+        fields = [
+            "id",
+            "status",
+            "privacy",
+            "error",
+            "report",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class UnitSerializer(serializers.ModelSerializer):
     class Meta:
         model = Unit
@@ -0,0 +1,93 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeRating,
+    Step,
+    Unit,
+)
+from .response_cache import bump_global_version, bump_recipe_versions
+from .utils.ingredient_index import ingredient_index
+from .utils.unit_conversion import unit_conversion_table
+from .utils.unit_lexicon import unit_lexicon
+
+
+class _PendingParents(threading.local):
+    """
+    Parent recipes of the children saved in the current transaction, per
+    thread like the database connections. Ids left by a rolled back
+    transaction are touched with the next commit, which only costs an
+    extra cache miss.
+    """
+
+    def __init__(self):
+        self.recipe_ids = set()
+
+
+_pending_parents = _PendingParents()
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def invalidate_unit_caches(sender, instance, **kwargs):
+    unit_conversion_table.invalidate()
+    unit_lexicon.invalidate()
+    bump_global_version()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_responses(sender, instance, **kwargs):
+    bump_global_version()
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_index(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: ingredient_index.add([instance]))
+    else:
+        # A rename moves the ingredient in the trie
+        ingredient_index.invalidate()
+
+
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, instance, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_responses(sender, instance, **kwargs):
+    bump_recipe_versions([instance.pk])
+
+
+def _touch_pending_parents():
+    recipe_ids = _pending_parents.recipe_ids
+    _pending_parents.recipe_ids = set()
+    if not recipe_ids:
+        # Already done by an earlier callback of the same commit
+        return
+    # Keeps Recipe.updated_at current for conditional GETs. update() sends
+    # no signal, so this doesn't bump the versions a second time.
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    bump_recipe_versions(recipe_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Step)
+@receiver(post_delete, sender=Step)
+@receiver(post_save, sender=RecipeRating)
+@receiver(post_delete, sender=RecipeRating)
+def invalidate_parent_recipe_responses(sender, instance, **kwargs):
+    # Saving a recipe with its ingredients and steps touches the parent
+    # once on commit, with a single UPDATE for all the recipes changed
+    _pending_parents.recipe_ids.add(instance.recipe_id)
+    transaction.on_commit(_touch_pending_parents)
@@ -0,0 +1,160 @@
+import logging
+
+from celery import shared_task
+from celery.signals import worker_process_init
+
+from recipes.models import (
+    ArchiveImportJob,
+    UploadJob,
+    UploadJobStatusChoices,
+)
+from recipes.utils.archive_import import import_recipe_archive
+from recipes.utils.extraction_sandbox import (
+    EXTRACT_DOCUMENT,
+    EXTRACT_RECIPE,
+    extract_text_sandboxed,
+)
+from recipes.utils.file_extraction import ExtractionError
+from recipes.utils.nlp_models import nlp_models
+from recipes.utils.recipe_processing import (
+    parse_recipe_text,
+    persist_recipes,
+)
+from recipes.utils.recipe_segmentation import parse_recipe_segments
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def warm_up_upload_worker(**kwargs):
+    # Upload workers load the NLP models before taking their first job
+    nlp_models.warm_up()
+
+
+def _storage_path(file_obj):
+    try:
+        return file_obj.path
+    except (AttributeError, NotImplementedError):
+        # Storage without local paths (e.g. remote storage)
+        return None
+
+
+def parse_uploaded_file(
+    uploaded_file, multiple_recipes: bool, extracted_text=None, normalize=True
+):
+    """
+    Extract the text of an uploaded file, unless `extracted_text` is
+    given, and parse the recipes in it. Nothing is saved.
+    Returns: (extracted_text, parse_result)
+    """
+    if extracted_text is None:
+        ext = f".{uploaded_file.file_type}"
+        # The whole document is needed to split it into recipes
+        mode = EXTRACT_DOCUMENT if multiple_recipes else EXTRACT_RECIPE
+        with uploaded_file.file.open("rb") as file_obj:
+            source = _storage_path(file_obj) or file_obj.read()
+        extracted_text = extract_text_sandboxed(source, ext, mode)
+    if not extracted_text:
+        raise ValueError("Could not extract any text from the file.")
+
+    if multiple_recipes:
+        parsed_recipes = list(
+            parse_recipe_segments([extracted_text], normalize=normalize)
+        )
+    else:
+        parsed_recipes = [
+            parse_recipe_text(extracted_text, normalize=normalize)
+        ]
+    if not parsed_recipes:
+        raise ValueError("No recipe found in the file.")
+
+    return extracted_text, {
+        "multiple_recipes": multiple_recipes,
+        "recipes": parsed_recipes,
+    }
+
+
+def _extract_and_parse(uploaded_file, multiple_recipes: bool) -> dict:
+    """
+    Run extraction and parsing for a file, storing both results on it so
+    identical uploads can skip them.
+    """
+    extracted_text, parse_result = parse_uploaded_file(
+        uploaded_file, multiple_recipes
+    )
+    uploaded_file.extracted_text = extracted_text
+    uploaded_file.parse_result = parse_result
+    uploaded_file.save(update_fields=["extracted_text", "parse_result"])
+    return parse_result
+
+
+@shared_task
+def process_upload_job(job_id: int):
+    """
+    Extract and parse the file of an upload job, recording the outcome on
+    the job so clients can poll for it.
+    """
+    job = UploadJob.objects.select_related("uploaded_file", "user").get(
+        pk=job_id
+    )
+    job.status = UploadJobStatusChoices.RUNNING
+    job.save(update_fields=["status"])
+
+    try:
+        uploaded_file = job.uploaded_file
+        parse_result = uploaded_file.parse_result or {}
+        job.cache_hit = (
+            parse_result.get("multiple_recipes") == job.multiple_recipes
+        )
+        if not job.cache_hit:
+            parse_result = _extract_and_parse(
+                uploaded_file, job.multiple_recipes
+            )
+        recipes = persist_recipes(
+            parse_result["recipes"], job.user, privacy=job.privacy
+        )
+    except Exception as exc:
+        logger.error(f"Upload job {job_id} failed: {exc}")
+        job.status = UploadJobStatusChoices.FAILED
+        job.error = str(exc)
+        job.error_code = (
+            exc.code if isinstance(exc, ExtractionError) else "parse_failed"
+        )
+        job.save(update_fields=["status", "error", "error_code", "cache_hit"])
+        return
+
+    job.status = UploadJobStatusChoices.DONE
+    job.recipe = recipes[0]
+    job.recipe_ids = [recipe.pk for recipe in recipes]
+    job.save(update_fields=["status", "recipe", "recipe_ids", "cache_hit"])
+
+
+@shared_task
+def process_archive_import_job(job_id: int):
+    """
+    Import the recipe files of an archive import job, recording the
+    per-file report on the job so clients can poll for it. The archive is
+    deleted afterwards.
+    """
+    job = ArchiveImportJob.objects.select_related("user").get(pk=job_id)
+    job.status = UploadJobStatusChoices.RUNNING
+    job.save(update_fields=["status"])
+
+    try:
+        with job.archive.open("rb") as archive_file:
+            report = import_recipe_archive(
+                archive_file, job.user, privacy=job.privacy
+            )
+    except Exception as exc:
+        # Only the archive as a whole, files fail on their own
+        logger.error(f"Archive import job {job_id} failed: {exc}")
+        job.status = UploadJobStatusChoices.FAILED
+        job.error = str(exc)
+        job.archive.delete(save=False)
+        job.save(update_fields=["status", "error", "archive"])
+        return
+
+    job.status = UploadJobStatusChoices.DONE
+    job.report = report
+    job.archive.delete(save=False)
+    job.save(update_fields=["status", "report", "archive"])
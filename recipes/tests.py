@@ -1 +1,1616 @@
-# Create your tests here.
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+import warnings
+import zipfile
+from decimal import Decimal
+from unittest import mock
+from xml.sax.saxutils import escape
+
+import fitz
+import spacy
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import generics
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from recipes.conditional_get import ConditionalGetMixin
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipePrivacyChoices,
+    RecipeRating,
+    Step,
+    Unit,
+    UploadedFile,
+)
+from recipes.serializers import (
+    FastRecipeSummarySerializer,
+    RecipeSummarySerializer,
+)
+from recipes.utils.archive_import import _persist_batch
+from recipes.utils.extraction_sandbox import (
+    EXTRACT_DOCUMENT,
+    ExtractionSandbox,
+    _SandboxWorker,
+)
+from recipes.utils.file_extraction import (
+    ExtractionError,
+    extract_text_from_file,
+    iter_text_from_file,
+)
+from recipes.utils.ingredient_index import ingredient_index
+from recipes.utils.ingredient_normalization import (
+    _canonical_name,
+    normalize_ingredient_names,
+)
+from recipes.utils.nlp_models import NLPModelRegistry
+from recipes.utils.quantity_parsing import parse_quantity
+from recipes.utils.recipe_processing import (
+    convert_unit,
+    get_or_create_ingredients,
+    merge_broken_ingredient_lines,
+    parse_ingredient_lines,
+    parse_recipe_text,
+    persist_recipes,
+    take_recipe_pages,
+)
+from recipes.utils.recipe_queries import recipes_for_fields
+from recipes.utils.recipe_segmentation import segment_recipes
+from recipes.utils.unit_conversion import unit_conversion_table
+from recipes.utils.unit_lexicon import unit_lexicon
+from recipes.views import IngredientAutocompleteThrottle
+
+
+class PublicRecipeListViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="cook", password="secret")
+        gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        cup = Unit.objects.create(
+            name="cup", abbreviation="cup", category="volume"
+        )
+        # Created in one statement, so many recipes share a created_at
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    title=f"Recipe {i}",
+                    user=user,
+                    privacy=RecipePrivacyChoices.PUBLIC,
+                )
+                for i in range(25)
+            ]
+        )
+        Recipe.objects.create(title="Private recipe", user=user)
+        ingredients = Ingredient.objects.bulk_create(
+            [Ingredient(name=f"ingredient {i}") for i in range(3)]
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    quantity=1,
+                    unit=gram if i % 2 else cup,
+                )
+                for recipe in recipes
+                for i, ingredient in enumerate(ingredients)
+            ]
+        )
+        Step.objects.bulk_create(
+            [
+                Step(recipe=recipe, order=order, text="Stir.")
+                for recipe in recipes
+                for order in range(1, 4)
+            ]
+        )
+        # The newest recipe, so it is on the first page
+        RecipeRating.objects.create(user=user, recipe=recipes[-1], rating=4)
+        cls.rated = recipes[-1]
+        cls.url = reverse("public_recipe_list")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_cover_every_public_recipe_once(self):
+        seen = []
+        url = f"{self.url}?page_size=10"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [recipe["id"] for recipe in response.data["results"]]
+            url = response.data["next"]
+
+        public = Recipe.objects.filter(privacy=RecipePrivacyChoices.PUBLIC)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertCountEqual(seen, public.values_list("id", flat=True))
+
+    def test_summary_is_the_default(self):
+        # The ETag/Last-Modified aggregate, then the page
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        recipes = {r["id"]: r for r in response.data["results"]}
+        self.assertEqual(
+            set(recipes[self.rated.pk]),
+            {"id", "title", "servings", "ingredient_count", "avg_rating"},
+        )
+        self.assertEqual(recipes[self.rated.pk]["ingredient_count"], 3)
+        self.assertEqual(recipes[self.rated.pk]["avg_rating"], 4)
+
+    def test_sparse_fields(self):
+        response = self.client.get(f"{self.url}?fields=id,title")
+        recipe = response.data["results"][0]
+        self.assertEqual(set(recipe), {"id", "title"})
+
+    def test_page_query_count_is_constant(self):
+        # The ETag/Last-Modified aggregate (see ListConditionalGetMixin),
+        # one query for the recipes, one each for steps and ingredients
+        url = f"{self.url}?page_size=5&expand=ingredients,steps"
+        with self.assertNumQueries(4):
+            first = self.client.get(url)
+        with self.assertNumQueries(4):
+            self.client.get(first.data["next"])
+
+        recipe = first.data["results"][0]
+        self.assertEqual(len(recipe["steps"]), 3)
+        self.assertEqual(len(recipe["ingredients"]), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"{self.url}?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+    def test_fast_serializer_matches_drf_serializer(self):
+        request = Request(
+            APIRequestFactory().get("/", {"expand": "ingredients,steps"})
+        )
+        fields = RecipeSummarySerializer.requested_fields(request)
+        queryset = recipes_for_fields(Recipe.objects.order_by("id"), fields)
+        context = {"request": request}
+
+        self.assertEqual(
+            FastRecipeSummarySerializer(queryset, context=context).data,
+            RecipeSummarySerializer(queryset, many=True, context=context).data,
+        )
+
+    def test_msgpack_is_negotiated(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+
+    def test_repeat_reads_are_cached_until_a_recipe_changes(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Response-Cache"], "hit")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Step.objects.create(recipe=self.rated, order=4, text="Serve.")
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+
+class RecipeDetailReadOnlyViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="cook", password="secret")
+        cls.recipe = Recipe.objects.create(
+            title="Soup", user=user, privacy=RecipePrivacyChoices.PUBLIC
+        )
+        cls.private = Recipe.objects.create(title="Secret", user=user)
+
+    def setUp(self):
+        cache.clear()
+
+    def detail_url(self, recipe, system="metric"):
+        url = reverse("public_recipe_detail", args=[recipe.pk])
+        return f"{url}?system={system}"
+
+    def test_cache_is_keyed_by_system_and_version(self):
+        self.client.get(self.detail_url(self.recipe))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url(self.recipe))
+        self.assertEqual(response.json()["title"], "Soup")
+
+        response = self.client.get(self.detail_url(self.recipe, "imperial"))
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.title = "Tomato soup"
+            self.recipe.save()
+        response = self.client.get(self.detail_url(self.recipe))
+        self.assertEqual(response.json()["title"], "Tomato soup")
+
+    def test_unknown_query_params_share_the_cached_response(self):
+        self.client.get(self.detail_url(self.recipe))
+        response = self.client.get(
+            f"{self.detail_url(self.recipe)}&utm_source=newsletter"
+        )
+        self.assertEqual(response["X-Response-Cache"], "hit")
+
+        response = self.client.get(
+            f"{self.detail_url(self.recipe)}&fields=id,title"
+        )
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+    def test_private_recipes_are_not_served(self):
+        response = self.client.get(self.detail_url(self.private))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        cls.recipe = Recipe.objects.create(title="Soup", user=cls.user)
+        Recipe.objects.create(title="Stew", user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_answers_304_after_one_query(self):
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Step.objects.create(recipe=self.recipe, order=1, text="Boil.")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_parent_is_touched_once_per_transaction(self):
+        updated_at = self.recipe.updated_at
+        with self.captureOnCommitCallbacks() as callbacks:
+            for order in range(1, 4):
+                Step.objects.create(recipe=self.recipe, order=order, text="")
+
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, updated_at)
+
+    def test_views_must_provide_the_validator_state(self):
+        class View(ConditionalGetMixin, generics.RetrieveAPIView):
+            queryset = Recipe.objects.all()
+
+        with self.assertRaises(TypeError):
+            View()
+
+    def test_list_is_validated_by_latest_update_and_count(self):
+        url = reverse("recipe_list")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Recipe.objects.filter(title="Stew").delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class RecipeUpdateTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        cls.gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        cls.recipe = Recipe.objects.create(title="Soup", user=cls.user)
+        for name in ("tomato", "onion", "salt"):
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe,
+                ingredient=Ingredient.objects.create(name=name),
+                quantity=100,
+                unit=cls.gram,
+            )
+        for order, text in enumerate(["Chop.", "Boil.", "Serve."], 1):
+            Step.objects.create(recipe=cls.recipe, order=order, text=text)
+        cls.url = reverse("recipe_detail", args=[cls.recipe.pk])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def row_ids(self):
+        return (
+            list(self.recipe.recipe_ingredients.values_list("id", flat=True)),
+            list(self.recipe.steps.values_list("id", flat=True)),
+        )
+
+    def test_put_only_writes_changed_rows(self):
+        ingredient_ids, step_ids = self.row_ids()
+        data = {
+            "title": "Soup",
+            "privacy": "private",
+            "description": "",
+            "servings": 1,
+            "ingredients": [
+                {"ingredient_name": name, "quantity": 100, "unit_id": unit}
+                for name, unit in (
+                    ("tomato", self.gram.pk),
+                    ("onion", self.gram.pk),
+                    ("salt", self.gram.pk),
+                )
+            ],
+            "steps": [
+                {"order": 1, "text": "Chop."},
+                {"order": 2, "text": "Boil well."},
+            ],
+        }
+
+        response = self.client.put(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.row_ids(), (ingredient_ids, step_ids[:2]))
+        self.assertEqual(
+            list(self.recipe.steps.values_list("text", flat=True)),
+            ["Chop.", "Boil well."],
+        )
+
+    def test_json_patch_edits_a_single_row(self):
+        ingredient_ids, step_ids = self.row_ids()
+        operations = [
+            {"op": "replace", "path": "/ingredients/1/quantity", "value": 50},
+            {"op": "remove", "path": "/steps/0"},
+            {"op": "add", "path": "/steps/-", "value": {"text": "Enjoy."}},
+        ]
+
+        response = self.client.patch(
+            self.url,
+            json.dumps(operations),
+            content_type="application/json-patch+json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        onion = RecipeIngredient.objects.get(pk=ingredient_ids[1])
+        self.assertEqual(onion.quantity, 50)
+        steps = list(self.recipe.steps.order_by("order"))
+        self.assertEqual([s.pk for s in steps[:2]], step_ids[1:])
+        self.assertEqual(
+            [(s.order, s.text) for s in steps],
+            [(1, "Boil."), (2, "Serve."), (3, "Enjoy.")],
+        )
+
+    def ingredient_names(self):
+        return list(
+            self.recipe.recipe_ingredients.values_list(
+                "ingredient__name", flat=True
+            )
+        )
+
+    def test_put_keeps_the_ingredient_order(self):
+        # Remove the first row and add one at the end, as the editor does
+        data = {
+            "title": "Soup",
+            "privacy": "private",
+            "description": "",
+            "servings": 1,
+            "ingredients": [
+                {"ingredient_name": name, "quantity": 100, "unit_id": unit}
+                for name, unit in (
+                    ("onion", self.gram.pk),
+                    ("salt", self.gram.pk),
+                    ("pepper", self.gram.pk),
+                )
+            ],
+            "steps": [{"order": 1, "text": "Chop."}],
+        }
+
+        response = self.client.put(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ingredient_names(), ["onion", "salt", "pepper"])
+        self.assertEqual(
+            [row["ingredient"] for row in response.data["ingredients"]],
+            ["onion", "salt", "pepper"],
+        )
+
+    def test_json_patch_adds_at_the_given_index(self):
+        operations = [
+            {
+                "op": "add",
+                "path": "/ingredients/0",
+                "value": {
+                    "ingredient_name": "butter",
+                    "quantity": 10,
+                    "unit_id": self.gram.pk,
+                },
+            },
+        ]
+
+        response = self.client.patch(
+            self.url,
+            json.dumps(operations),
+            content_type="application/json-patch+json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.ingredient_names(), ["butter", "tomato", "onion", "salt"]
+        )
+
+    def test_json_patch_rejects_unknown_paths(self):
+        response = self.client.patch(
+            self.url,
+            json.dumps([{"op": "remove", "path": "/title"}]),
+            content_type="application/json-patch+json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeImportViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        cls.gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        cls.url = reverse("recipe_import")
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def recipe_line(self, title, unit_id=None):
+        return json.dumps(
+            {
+                "title": title,
+                "privacy": "private",
+                "description": "",
+                "servings": 2,
+                "ingredients": [
+                    {
+                        "ingredient_name": "flour",
+                        "quantity": 200,
+                        "unit_id": unit_id or self.gram.pk,
+                    }
+                ],
+                "steps": [{"order": 1, "text": "Mix."}],
+            }
+        )
+
+    def test_valid_lines_are_saved_in_batches(self):
+        lines = [self.recipe_line(f"Bread {i}") for i in range(5)]
+        lines.insert(2, "{not json")
+        lines.insert(4, self.recipe_line("Bad unit", unit_id=999))
+        body = "\n".join(lines + [""])
+
+        response = self.client.post(
+            f"{self.url}?batch_size=2",
+            body,
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 5)
+        self.assertEqual(
+            [error["line"] for error in response.data["errors"]], [3, 5]
+        )
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(
+            RecipeIngredient.objects.filter(recipe__in=recipes).count(), 5
+        )
+        self.assertEqual(Ingredient.objects.filter(name="flour").count(), 1)
+
+    def test_invalid_batch_size(self):
+        response = self.client.post(
+            f"{self.url}?batch_size=0",
+            self.recipe_line("Bread"),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeExportViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        flour = Ingredient.objects.create(name="flour")
+        for i in range(3):
+            recipe = Recipe.objects.create(title=f"Bread {i}", user=cls.user)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=flour, quantity=200, unit=gram
+            )
+            Step.objects.create(recipe=recipe, order=1, text="Knead.")
+        Recipe.objects.create(
+            title="Not mine",
+            user=User.objects.create_user(username="other", password="x"),
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def export(self, file_format):
+        url = reverse("recipe_export", args=[file_format])
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_chunks_prefetch_and_round_trip_through_import(self):
+        # One streamed query for the recipes, then ingredients with their
+        # units and steps for each of the two chunks
+        with self.settings(RECIPE_EXPORT_CHUNK_SIZE=2):
+            with self.assertNumQueries(5):
+                body = self.export("ndjson")
+
+        lines = body.splitlines()
+        self.assertEqual(
+            [json.loads(line)["title"] for line in lines],
+            ["Bread 0", "Bread 1", "Bread 2"],
+        )
+        response = self.client.post(
+            reverse("recipe_import"),
+            body,
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(response.data["errors"], [])
+
+    def test_csv_has_one_row_per_recipe(self):
+        rows = list(csv.reader(io.StringIO(self.export("csv"))))
+        self.assertEqual(rows[0][:2], ["id", "title"])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][5], "200 g flour")
+        self.assertEqual(rows[1][6], "1. Knead.")
+
+
+class IngredientAutocompleteViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="cook", password="x")
+        gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name)
+                for name in ("tomato", "tomato paste", "onion", "red onion")
+            ]
+        )
+        paste = Ingredient.objects.get(name="tomato paste")
+        for title in ("Pizza", "Ragu"):
+            RecipeIngredient.objects.create(
+                recipe=Recipe.objects.create(title=title, user=user),
+                ingredient=paste,
+                quantity=1,
+                unit=gram,
+            )
+        cls.user = user
+        cls.url = reverse("ingredient-autocomplete")
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index.invalidate()
+        self.client.force_authenticate(self.user)
+
+    def names(self, q):
+        response = self.client.get(self.url, {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient["name"] for ingredient in response.data]
+
+    def test_prefixes_are_ranked_by_usage(self):
+        self.assertEqual(self.names("Tom"), ["tomato paste", "tomato"])
+
+    def test_word_starts_and_typos_match(self):
+        self.assertEqual(self.names("oni"), ["onion", "red onion"])
+        self.assertEqual(self.names("tomatoe"), ["tomato", "tomato paste"])
+
+    def test_new_ingredients_are_added_without_a_rebuild(self):
+        self.names("to")
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="tofu")
+        with self.assertNumQueries(0):
+            self.assertIn("tofu", self.names("tof"))
+
+    def test_anonymous_visitors_get_no_suggestions(self):
+        # The index holds the ingredients of private recipes too
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url, {"q": "tom"})
+        self.assertEqual(response.status_code, 401)
+
+    @mock.patch.object(
+        IngredientAutocompleteThrottle,
+        "THROTTLE_RATES",
+        {"ingredient_autocomplete": "2/minute"},
+    )
+    def test_requests_are_rate_limited_per_user(self):
+        self.names("to")
+        self.names("tom")
+        response = self.client.get(self.url, {"q": "toma"})
+        self.assertEqual(response.status_code, 429)
+
+
+class TakeRecipePagesTests(SimpleTestCase):
+    first_page = "Pancakes\nIngredients\n2 cups flour\nDirections\n"
+
+    def test_stops_at_the_next_recipe(self):
+        pages = iter([self.first_page, "1. Mix.\n", "Waffles\nIngredients\n"])
+        self.assertEqual(
+            take_recipe_pages(pages), self.first_page + "1. Mix.\n"
+        )
+        self.assertEqual(list(pages), [])
+
+    def test_steps_mentioning_ingredients_do_not_end_the_recipe(self):
+        pages = [
+            self.first_page,
+            "1. Whisk the dry ingredients together.\n",
+            "2. Fold in the wet ingredients and bake.\n",
+        ]
+        self.assertEqual(take_recipe_pages(iter(pages)), "".join(pages))
+
+
+class CrashingSandbox(ExtractionSandbox):
+    def _wait_for_result(self, worker):
+        worker.process.kill()
+        return super()._wait_for_result(worker)
+
+
+class PdfExtractionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Above the default PDF_PARALLEL_PAGE_THRESHOLD
+        document = fitz.open()
+        for number in range(1, 61):
+            page = document.new_page()
+            page.insert_text((50, 50), f"Recipe {number}\n1. Step {number}.")
+        cls.path = f"{tempfile.mkdtemp()}/cookbook.pdf"
+        document.save(cls.path)
+        document.close()
+        cls.serial_text = "".join(iter_text_from_file(cls.path, ".pdf"))
+
+    @override_settings(PDF_EXTRACTION_WORKERS=2)
+    def test_parallel_extraction_matches_the_serial_path(self):
+        with self.assertLogs("recipes.utils.file_extraction") as logs:
+            text = "".join(
+                iter_text_from_file(self.path, ".pdf", parallel=True)
+            )
+        self.assertIn("with 2 workers", logs.output[-1])
+        self.assertIn("Recipe 60", text)
+        self.assertEqual(text, self.serial_text)
+
+    def test_sandbox_extracts_every_page_of_a_document(self):
+        sandbox = ExtractionSandbox(
+            workers=1, timeout=30, memory_limit_mb=512, max_jobs=10
+        )
+        try:
+            text = sandbox.extract(self.path, ".pdf", EXTRACT_DOCUMENT)
+        finally:
+            sandbox.shutdown()
+        self.assertEqual(text, self.serial_text)
+
+
+class ExtractionSandboxTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Takes long enough to parse for the timeout and RSS checks
+        cls.long_docx = build_docx("2 cups flour\n" * 100000)
+
+    def sandbox(self, sandbox_class=ExtractionSandbox, **options):
+        sandbox = sandbox_class(
+            **{
+                "workers": 1,
+                "timeout": 30,
+                "memory_limit_mb": 512,
+                "max_jobs": 10,
+                **options,
+            }
+        )
+        self.addCleanup(sandbox.shutdown)
+        return sandbox
+
+    def extract_error(self, sandbox_class=ExtractionSandbox, **options):
+        sandbox = self.sandbox(sandbox_class, **options)
+        with self.assertRaises(ExtractionError) as raised:
+            sandbox.extract(self.long_docx, ".docx", EXTRACT_DOCUMENT)
+        # The worker is killed, not returned to the pool
+        self.assertTrue(sandbox._idle.empty())
+        return raised.exception.code
+
+    def test_slow_jobs_are_killed(self):
+        self.assertEqual(self.extract_error(timeout=0.05), "timeout")
+
+    def test_starting_the_worker_does_not_count_towards_the_timeout(self):
+        # Spawning a worker and setting up Django takes longer than this
+        sandbox = self.sandbox(timeout=0.5)
+        self.assertEqual(
+            sandbox.extract(build_docx(PANCAKES), ".docx"), PANCAKES
+        )
+
+    def test_dead_idle_workers_are_replaced(self):
+        sandbox = self.sandbox()
+        sandbox.extract(build_docx(PANCAKES), ".docx")
+        idle = sandbox._idle.get_nowait()
+        idle.process.kill()
+        idle.process.join()
+        sandbox._idle.put(idle)
+
+        self.assertEqual(
+            sandbox.extract(build_docx(PANCAKES), ".docx"), PANCAKES
+        )
+        self.assertIsNot(sandbox._idle.get_nowait(), idle)
+
+    def test_jobs_over_the_memory_limit_are_killed(self):
+        # A limit low enough to be hit by parsing this file would already
+        # stop the worker from starting through RLIMIT_AS
+        with mock.patch.object(_SandboxWorker, "rss", return_value=2**30):
+            self.assertEqual(self.extract_error(), "memory_limit")
+
+    def test_crashed_workers_are_reported(self):
+        self.assertEqual(self.extract_error(CrashingSandbox), "crashed")
+
+
+def docx_with_body(body):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as docx:
+        docx.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+            f'wordprocessingml/2006/main"><w:body>{body}</w:body>'
+            "</w:document>",
+        )
+    return buffer.getvalue()
+
+
+def paragraph(text):
+    return f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>"
+
+
+def build_docx(text):
+    return docx_with_body("".join(map(paragraph, text.splitlines())))
+
+
+PANCAKES = "Pancakes\nIngredients\n2 cups flour\nDirections\n1. Mix.\n"
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    EXTRACTION_SANDBOX=False,
+    ARCHIVE_UPLOAD_WORKERS=2,
+)
+class RecipeArchiveUploadViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        Unit.objects.create(name="cup", abbreviation="cup", category="volume")
+        cls.url = reverse("archive_upload_recipes")
+
+    def setUp(self):
+        unit_lexicon.invalidate()
+        self.client.force_authenticate(self.user)
+
+    def build_archive(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("pancakes.docx", build_docx(PANCAKES))
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # Duplicate name
+                archive.writestr("pancakes.docx", build_docx(PANCAKES))
+            archive.writestr("notes.txt", "Not a recipe")
+            archive.writestr("broken.docx", "Not a DOCX file")
+            archive.writestr("corrupt.docx", build_docx(PANCAKES))
+        data = buffer.getvalue()
+        # Flip a byte of the last member, so its CRC no longer matches
+        corrupt_at = data.rindex(b"word/document.xml") + 30
+        data = (
+            data[:corrupt_at]
+            + bytes([data[corrupt_at] ^ 1])
+            + data[corrupt_at + 1 :]
+        )
+        return SimpleUploadedFile("recipes.zip", data)
+
+    # Names are normalized with spaCy, see IngredientNormalizationTests
+    @mock.patch("recipes.utils.archive_import.normalize_parsed_recipes")
+    def test_archive_is_imported_in_a_job_file_by_file(self, normalize):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url, {"file": self.build_archive()}, format="multipart"
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "queued")
+
+        response = self.client.get(
+            reverse("archive_import_job_detail", args=[response.data["id"]])
+        )
+        self.assertEqual(response.data["status"], "done")
+        report = response.data["report"]
+        self.assertEqual(
+            [result["file"] for result in report["results"]],
+            [
+                "pancakes.docx",
+                "pancakes.docx",
+                "notes.txt",
+                "broken.docx",
+                "corrupt.docx",
+            ],
+        )
+        recipe_ids = [result["recipe"] for result in report["results"]]
+        self.assertEqual(
+            sorted(recipe_ids[:2]),
+            list(Recipe.objects.order_by("id").values_list("id", flat=True)),
+        )
+        self.assertEqual(recipe_ids[2:], [None, None, None])
+        self.assertIn("Could not read the file", report["results"][4]["error"])
+        self.assertEqual((report["created"], report["failed"]), (2, 3))
+        normalize.assert_called_once()
+
+    def test_files_that_are_not_archives_are_rejected(self):
+        response = self.client.post(
+            self.url,
+            {"file": SimpleUploadedFile("recipes.zip", b"Not a ZIP")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch("recipes.utils.archive_import.normalize_parsed_recipes")
+    def test_a_recipe_that_cannot_be_saved_only_fails_itself(self, _):
+        parsed = {
+            "title": "Pancakes",
+            "description": "",
+            "ingredients": [],
+            "steps": ["Mix."],
+        }
+        results = {}
+        _persist_batch(
+            [
+                (0, "good.docx", parsed),
+                (1, "bad.docx", {**parsed, "title": None}),
+            ],
+            self.user,
+            "private",
+            results,
+        )
+        self.assertEqual(
+            results[0]["recipe"], Recipe.objects.get(title="Pancakes").pk
+        )
+        self.assertIsNone(results[1]["recipe"])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    @mock.patch(
+        "recipes.utils.archive_import.normalize_parsed_recipes",
+        side_effect=OSError("Can't find model 'en_core_web_sm'."),
+    )
+    def test_a_normalization_failure_fails_the_batch(self, _):
+        parsed = {
+            "title": "Pancakes",
+            "description": "",
+            "ingredients": [],
+            "steps": ["Mix."],
+        }
+        results = {}
+        _persist_batch(
+            [(0, "a.docx", parsed), (1, "b.docx", dict(parsed))],
+            self.user,
+            "private",
+            results,
+        )
+        self.assertEqual(
+            [result["error"] for result in results.values()],
+            ["Can't find model 'en_core_web_sm'."] * 2,
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+
+class UnitConversionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight", is_base_unit=True
+        )
+        cls.kilogram = Unit.objects.create(
+            name="kilogram",
+            abbreviation="kg",
+            category="weight",
+            base_conversion_factor=1000,
+        )
+        Unit.objects.create(
+            name="ounce",
+            abbreviation="oz",
+            category="weight",
+            base_conversion_factor=28.35,
+            system="imperial",
+            is_base_unit=True,
+        )
+        cls.piece = Unit.objects.create(
+            name="piece", abbreviation="pcs", category="count"
+        )
+
+    def setUp(self):
+        unit_conversion_table.invalidate()
+
+    def test_converts_to_the_base_unit_of_the_system(self):
+        self.assertEqual(convert_unit(2, self.kilogram, "metric"), (2000, "g"))
+        self.assertEqual(convert_unit(100, self.gram, "imperial"), (3.5, "oz"))
+
+    def test_units_that_cannot_be_converted_are_kept(self):
+        self.assertEqual(convert_unit(3, self.piece, "imperial"), (3, "pcs"))
+
+    def test_table_is_loaded_once_until_a_unit_changes(self):
+        with self.assertNumQueries(1):
+            convert_unit(1, self.kilogram, "imperial")
+            convert_unit(1, self.gram, "imperial")
+        self.kilogram.base_conversion_factor = 500
+        self.kilogram.save()
+        self.assertEqual(convert_unit(2, self.kilogram, "metric"), (1000, "g"))
+
+    def test_table_is_rebuilt_after_its_max_age(self):
+        convert_unit(1, self.kilogram, "metric")
+        # Changed by another process, which sends no signal here
+        Unit.objects.filter(pk=self.kilogram.pk).update(
+            base_conversion_factor=500
+        )
+        self.assertEqual(convert_unit(2, self.kilogram, "metric"), (2000, "g"))
+
+        with override_settings(UNIT_CACHE_MAX_AGE_SECONDS=0):
+            self.assertEqual(
+                convert_unit(2, self.kilogram, "metric"), (1000, "g")
+            )
+
+
+class UnitLexiconTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        cls.tablespoon = Unit.objects.create(
+            name="tablespoon", abbreviation="tbsp", category="volume"
+        )
+        cls.piece = Unit.objects.create(
+            name="piece", abbreviation="pcs", category="count"
+        )
+
+    def setUp(self):
+        unit_lexicon.invalidate()
+
+    def test_longest_unit_or_synonym_is_split_off(self):
+        self.assertEqual(
+            unit_lexicon.split("tablespoons olive oil"),
+            (self.tablespoon, "olive oil"),
+        )
+        self.assertEqual(
+            unit_lexicon.split("grated cheese, 50 g"),
+            (self.gram, "grated cheese, 50"),
+        )
+        self.assertEqual(unit_lexicon.split("eggs"), (None, "eggs"))
+        self.assertEqual(unit_lexicon.fallback_unit, self.piece)
+
+    def test_only_the_first_unit_is_removed(self):
+        # Later mentions belong to the ingredient text, they used to be
+        # removed too
+        self.assertEqual(
+            unit_lexicon.split("tbsp oil, plus 1 tbsp to fry"),
+            (self.tablespoon, "oil, plus 1 tbsp to fry"),
+        )
+
+    def test_lexicon_is_rebuilt_after_a_unit_changes(self):
+        unit_lexicon.split("pinch salt")
+        pinch = Unit.objects.create(
+            name="pinch", abbreviation="pinch", category="weight"
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(unit_lexicon.split("pinch salt"), (pinch, "salt"))
+
+    def test_lexicon_is_rebuilt_after_its_max_age(self):
+        unit_lexicon.split("pinch salt")
+        # Created by another process, which sends no signal here
+        Unit.objects.bulk_create(
+            [Unit(name="pinch", abbreviation="pinch", category="weight")]
+        )
+        self.assertEqual(
+            unit_lexicon.split("pinch salt"), (None, "pinch salt")
+        )
+
+        with override_settings(UNIT_CACHE_MAX_AGE_SECONDS=0):
+            unit, rest = unit_lexicon.split("pinch salt")
+        self.assertEqual((unit.abbreviation, rest), ("pinch", "salt"))
+
+
+class RecipeParsingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+        cls.tablespoon = Unit.objects.create(
+            name="tablespoon", abbreviation="tbsp", category="volume"
+        )
+        cls.piece = Unit.objects.create(
+            name="piece", abbreviation="pcs", category="count"
+        )
+
+    def setUp(self):
+        unit_lexicon.invalidate()
+
+    def test_broken_ingredient_lines_are_merged(self):
+        self.assertEqual(
+            merge_broken_ingredient_lines(
+                [
+                    "2 tbsp olive oil",
+                    "chopped",
+                    "",
+                    "250 g flour,",
+                    "sifted twice",
+                    "Parsley",
+                    "to taste",
+                ]
+            ),
+            [
+                "2 tbsp olive oil chopped",
+                "250 g flour, sifted twice",
+                "Parsley to taste",
+            ],
+        )
+
+    def test_ingredient_lines_are_parsed(self):
+        ingredients = parse_ingredient_lines(
+            [
+                "2 tbsp olive oil",
+                "3 eggs",
+                "50 g grated cheese, to serve",
+                "1 tbsp chives",
+            ]
+        )
+
+        self.assertEqual(
+            [
+                (i["name"], i["quantity"], i["unit"], i["is_optional"])
+                for i in ingredients
+            ],
+            [
+                ("olive oil", Decimal("2"), self.tablespoon, False),
+                ("eggs", Decimal("3"), self.piece, False),
+                ("grated cheese", Decimal("50"), self.gram, True),
+                # Everything after an optional keyword is optional
+                ("chives", Decimal("1"), self.tablespoon, True),
+            ],
+        )
+
+    def test_recipe_text_is_parsed_without_normalization(self):
+        parsed = parse_recipe_text(
+            "Pancakes\n"
+            "Fluffy breakfast pancakes.\n"
+            "Ingredients\n"
+            "250 g flour\n"
+            "2 eggs\n"
+            "Method\n"
+            "1. Whisk the flour and eggs.\n"
+            "Rest for ten minutes.\n"
+            "2. Fry in a hot pan.",
+            normalize=False,
+        )
+
+        self.assertEqual(
+            parsed,
+            {
+                "title": "Pancakes",
+                "description": "Fluffy breakfast pancakes.",
+                "ingredients": [
+                    {
+                        "name": "flour",
+                        "quantity": 250.0,
+                        "unit_id": self.gram.pk,
+                        "is_optional": False,
+                    },
+                    {
+                        "name": "eggs",
+                        "quantity": 2.0,
+                        "unit_id": self.piece.pk,
+                        "is_optional": False,
+                    },
+                ],
+                "steps": [
+                    "1. Whisk the flour and eggs. Rest for ten minutes.",
+                    "2. Fry in a hot pan.",
+                ],
+            },
+        )
+
+    def test_sections_start_at_header_lines_only(self):
+        parsed = parse_recipe_text(
+            "Pancakes\n"
+            "Mix the ingredients for a quick breakfast.\n"
+            "Ingredients:\n"
+            "2 eggs\n"
+            "Method\n"
+            "1. Whisk the dry ingredients.\n"
+            "2. Follow the method on the pack.",
+            normalize=False,
+        )
+
+        self.assertEqual(
+            parsed["description"], "Mix the ingredients for a quick breakfast."
+        )
+        self.assertEqual(
+            [ingredient["name"] for ingredient in parsed["ingredients"]],
+            ["eggs"],
+        )
+        self.assertEqual(
+            parsed["steps"],
+            [
+                "1. Whisk the dry ingredients.",
+                "2. Follow the method on the pack.",
+            ],
+        )
+
+    def test_segment_starting_with_the_ingredients_header(self):
+        parsed = parse_recipe_text(
+            "Ingredients\n2 eggs\nMethod\n1. Whisk.\n2. Fry.",
+            normalize=False,
+        )
+
+        self.assertEqual(parsed["title"], "Untitled Recipe")
+        self.assertEqual(parsed["description"], "")
+        self.assertEqual(
+            [ingredient["name"] for ingredient in parsed["ingredients"]],
+            ["eggs"],
+        )
+        self.assertEqual(parsed["steps"], ["1. Whisk.", "2. Fry."])
+
+    def test_recipe_text_without_ingredients_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_recipe_text("Pancakes\nMix and fry.", normalize=False)
+
+
+@mock.patch(
+    "recipes.management.commands.reparse_uploads.normalize_parsed_recipes"
+)
+class ReparseUploadsCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.piece = Unit.objects.create(
+            name="piece", abbreviation="pcs", category="count"
+        )
+        cls.uploads = [
+            UploadedFile.objects.create(
+                name=f"recipe-{n}.docx",
+                file=f"uploads/recipe-{n}.docx",
+                extracted_text=f"Recipe {n}\nIngredients\n2 eggs\nMethod\nFry.",
+                parse_result={"multiple_recipes": False, "recipes": []},
+            )
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        unit_lexicon.invalidate()
+        self.checkpoint = f"{tempfile.mkdtemp()}/checkpoint.json"
+
+    def reparse(self, *args):
+        stdout = io.StringIO()
+        call_command(
+            "reparse_uploads",
+            "--workers=1",
+            "--batch-size=2",
+            f"--checkpoint={self.checkpoint}",
+            *args,
+            stdout=stdout,
+            stderr=io.StringIO(),
+        )
+        return stdout.getvalue()
+
+    def parse_results(self):
+        return [
+            upload.parse_result["recipes"]
+            for upload in UploadedFile.objects.order_by("pk")
+        ]
+
+    def test_dry_run_saves_nothing(self, _):
+        output = self.reparse("--dry-run")
+
+        self.assertIn("Dry run: 3 uploads would change.", output)
+        self.assertIn('+   "title": "Recipe 0"', output)
+        self.assertEqual(self.parse_results(), [[], [], []])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_reparsed_results_are_saved(self, normalize):
+        self.reparse()
+
+        self.assertEqual(
+            self.parse_results(),
+            [
+                [parse_recipe_text(upload.extracted_text, normalize=False)]
+                for upload in self.uploads
+            ],
+        )
+        self.assertEqual(normalize.call_count, 2)
+        # Finished, so there is nothing left to resume
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_run_resumes_after_the_checkpoint(self, _):
+        with open(self.checkpoint, "w") as checkpoint:
+            json.dump({"last_pk": self.uploads[1].pk}, checkpoint)
+
+        output = self.reparse("--resume")
+
+        self.assertIn("Re-parsing 1 uploads.", output)
+        self.assertEqual(
+            [bool(recipes) for recipes in self.parse_results()],
+            [False, False, True],
+        )
+
+    def test_resume_needs_a_checkpoint(self, _):
+        with self.assertRaises(CommandError):
+            self.reparse("--resume")
+
+
+def parsed_recipe(title, ingredient_names, unit):
+    return {
+        "title": title,
+        "description": "",
+        "ingredients": [
+            {
+                "name": name,
+                "quantity": 1,
+                "unit_id": unit.pk,
+                "is_optional": False,
+            }
+            for name in ingredient_names
+        ],
+        "steps": ["Mix.", "Bake."],
+    }
+
+
+class PersistRecipesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        cls.flour = Ingredient.objects.create(name="flour")
+        cls.gram = Unit.objects.create(
+            name="gram", abbreviation="g", category="weight"
+        )
+
+    def test_ingredients_are_resolved_in_three_queries(self):
+        with self.assertNumQueries(3):
+            ingredients = get_or_create_ingredients(
+                ["flour", "sugar", "salt", "sugar"]
+            )
+        self.assertEqual(ingredients["flour"], self.flour)
+        self.assertEqual(
+            set(Ingredient.objects.values_list("name", flat=True)),
+            {"flour", "sugar", "salt"},
+        )
+        with self.assertNumQueries(1):
+            get_or_create_ingredients(["flour", "salt"])
+
+    def test_query_count_does_not_grow_with_the_recipes(self):
+        # One insert per table, three queries for the ingredients, and the
+        # savepoint of the transaction
+        with self.assertNumQueries(8):
+            persist_recipes(
+                [parsed_recipe("Bread", ["flour", "yeast"], self.gram)],
+                self.user,
+            )
+        with self.assertNumQueries(8):
+            recipes = persist_recipes(
+                [
+                    parsed_recipe(
+                        f"Cake {n}",
+                        ["flour", f"topping {n}", "egg"],
+                        self.gram,
+                    )
+                    for n in range(20)
+                ],
+                self.user,
+            )
+        self.assertEqual(
+            [
+                ri.ingredient.name
+                for ri in recipes[3].recipe_ingredients.select_related(
+                    "ingredient"
+                )
+            ],
+            ["flour", "topping 3", "egg"],
+        )
+        self.assertEqual(
+            list(recipes[3].steps.values_list("text", flat=True)),
+            ["Mix.", "Bake."],
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXTRACTION_SANDBOX=False)
+class RecipeUploadViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cook", password="x")
+        Unit.objects.create(name="cup", abbreviation="cup", category="volume")
+        cls.url = reverse("file_upload_recipe")
+
+    def setUp(self):
+        unit_lexicon.invalidate()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, docx, multiple_recipes=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                {
+                    "name": "Recipe",
+                    "file": SimpleUploadedFile("recipe.docx", docx),
+                    "multiple_recipes": multiple_recipes,
+                },
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "queued")
+        return response.data["id"]
+
+    def poll(self, job_id):
+        response = self.client.get(reverse("upload_job_detail", args=[job_id]))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_failures_are_reported_on_the_job(self):
+        job = self.poll(self.upload(build_docx("Pancakes\nMix everything.\n")))
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error_code"], "parse_failed")
+        self.assertEqual(
+            job["error"], "No 'Ingredients' section found in text."
+        )
+        self.assertIsNone(job["recipe"])
+
+    def test_jobs_of_other_users_are_not_found(self):
+        job_id = self.upload(build_docx(PANCAKES))
+        self.client.force_authenticate(
+            User.objects.create_user(username="other", password="x")
+        )
+        response = self.client.get(reverse("upload_job_detail", args=[job_id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_identical_uploads_reuse_the_parse_result(self):
+        docx = build_docx(PANCAKES)
+        self.upload(docx)
+        uploaded_file = UploadedFile.objects.get()
+        # Differs from what parsing the file gives, so a reuse shows
+        uploaded_file.parse_result = {
+            "multiple_recipes": False,
+            "recipes": [parsed_recipe("Stored pancakes", [], None)],
+        }
+        uploaded_file.save(update_fields=["parse_result"])
+
+        job = self.poll(self.upload(docx))
+        self.assertEqual(UploadedFile.objects.count(), 1)
+        self.assertEqual(job["status"], "done")
+        self.assertTrue(job["cache_hit"])
+        self.assertEqual(
+            Recipe.objects.get(pk=job["recipe"]).title, "Stored pancakes"
+        )
+
+        self.client.force_authenticate(
+            User.objects.create_superuser(username="admin", password="x")
+        )
+        response = self.client.get(reverse("upload_cache_stats"))
+        self.assertEqual(response.data["hits"], 1)
+
+    def test_cache_is_missed_when_the_recipes_are_split_differently(self):
+        docx = build_docx(PANCAKES)
+        self.upload(docx)
+        UploadedFile.objects.update(
+            parse_result={"multiple_recipes": False, "recipes": []}
+        )
+        job = self.poll(self.upload(docx, multiple_recipes=True))
+        self.assertFalse(job["cache_hit"])
+
+    @unittest.skipUnless(
+        spacy.util.is_package("en_core_web_sm"),
+        "Ingredient normalization needs the en_core_web_sm model.",
+    )
+    def test_recipe_is_created_by_the_job(self):
+        job = self.poll(self.upload(build_docx(PANCAKES)))
+        self.assertEqual(job["status"], "done")
+        recipe = Recipe.objects.get(pk=job["recipe"])
+        self.assertEqual(job["recipe_ids"], [recipe.pk])
+        self.assertEqual(recipe.title, "Pancakes")
+        self.assertEqual(recipe.user, self.user)
+
+
+class SegmentRecipesTests(SimpleTestCase):
+    cookbook = (
+        "Pancakes\n"
+        "Ingredients\n"
+        "2 cups flour\n"
+        "Directions\n"
+        "1. Whisk the dry ingredients.\n"
+        "2. Fry.\n"
+        "Waffles\n"
+        "Crisp and light.\n"
+        "Ingredients:\n"
+        "1 cup milk\n"
+        "Method\n"
+        "Mix and bake.\n"
+        "Scones\n"
+        "Ingredients\n"
+        "3 cups flour\n"
+    )
+
+    def test_each_recipe_keeps_its_title_and_description(self):
+        self.assertEqual(
+            list(segment_recipes([self.cookbook])),
+            [
+                "Pancakes\nIngredients\n2 cups flour\nDirections\n"
+                "1. Whisk the dry ingredients.\n2. Fry.",
+                # Numbered steps: every line after the last step moves on
+                "Waffles\nCrisp and light.\nIngredients:\n1 cup milk\n"
+                "Method\nMix and bake.",
+                # Unnumbered steps: only the last line moves on
+                "Scones\nIngredients\n3 cups flour",
+            ],
+        )
+
+    def test_pages_are_read_as_one_text(self):
+        lines = self.cookbook.splitlines(keepends=True)
+        pages = ["".join(lines[:5]), "".join(lines[5:9]), "".join(lines[9:])]
+        self.assertEqual(
+            list(segment_recipes(pages)),
+            list(segment_recipes([self.cookbook])),
+        )
+
+
+def table(*rows):
+    return (
+        "<w:tbl>"
+        + "".join(
+            "<w:tr>"
+            + "".join(f"<w:tc>{cell}</w:tc>" for cell in row)
+            + "</w:tr>"
+            for row in rows
+        )
+        + "</w:tbl>"
+    )
+
+
+class DocxExtractionTests(SimpleTestCase):
+    def extract(self, body):
+        return extract_text_from_file(
+            io.BytesIO(docx_with_body(body)), ".docx"
+        )
+
+    def test_table_rows_become_lines(self):
+        body = (
+            paragraph("Ingredients")
+            + table(
+                [paragraph("2"), paragraph("cups"), paragraph("flour")],
+                # Empty cells leave no gaps
+                [paragraph("1"), paragraph(""), paragraph("egg")],
+            )
+            + paragraph("Directions")
+        )
+        self.assertEqual(
+            self.extract(body),
+            "Ingredients\n2 cups flour\n1 egg\nDirections\n",
+        )
+
+    def test_cell_paragraphs_and_nested_tables_stay_in_their_cell(self):
+        body = table(
+            [
+                paragraph("3") + paragraph("tbsp"),
+                paragraph("oil") + table([paragraph("or butter")]),
+            ]
+        )
+        self.assertEqual(self.extract(body), "3 tbsp oil or butter\n")
+
+    def test_tabs_and_breaks(self):
+        body = (
+            "<w:p><w:r><w:t>1</w:t><w:tab/><w:t>onion</w:t><w:br/>"
+            "<w:t>2 carrots</w:t></w:r></w:p>"
+        )
+        self.assertEqual(self.extract(body), "1 onion\n2 carrots\n")
+
+
+class IngredientNormalizationTests(SimpleTestCase):
+    def test_stop_words_are_dropped_unless_part_of_the_name(self):
+        # The blank pipeline only has the tokenizer and lexical attributes
+        nlp = spacy.blank("en")
+        self.assertEqual(
+            _canonical_name(nlp("all purpose flour")), "all purpose flour"
+        )
+        self.assertEqual(_canonical_name(nlp("the whole milk")), "whole milk")
+
+    @unittest.skipUnless(
+        spacy.util.is_package("en_core_web_sm"),
+        "Ingredient normalization needs the en_core_web_sm model.",
+    )
+    def test_names_are_normalized(self):
+        self.assertEqual(
+            normalize_ingredient_names(
+                ["all-purpose flour", "large onions, finely chopped", "of"]
+            ),
+            ["all purpose flour", "onion", "of"],
+        )
+
+
+class ParseQuantityTests(SimpleTestCase):
+    def assertQuantity(self, text, quantity, rest):
+        self.assertEqual(parse_quantity(text), (quantity, rest))
+
+    def test_numbers_and_fractions(self):
+        self.assertQuantity("2 eggs", 2, "eggs")
+        self.assertQuantity("1/2 cup milk", 0.5, "cup milk")
+        self.assertQuantity("1 1/2 cups flour", 1.5, "cups flour")
+        self.assertQuantity("½ tsp salt", 0.5, "tsp salt")
+        self.assertQuantity("1½ cups sugar", 1.5, "cups sugar")
+        self.assertQuantity("3 ¾ cups water", 3.75, "cups water")
+
+    def test_decimals(self):
+        self.assertQuantity("1.25 kg beef", 1.25, "kg beef")
+        self.assertQuantity(".5 cup milk", 0.5, "cup milk")
+        self.assertQuantity("1,5 l water", 1.5, "l water")
+        self.assertQuantity("1,000 g flour", 1000, "g flour")
+
+    def test_ranges_give_their_lower_bound(self):
+        self.assertQuantity("2-3 eggs", 2, "eggs")
+        self.assertQuantity("2 to 3 eggs", 2, "eggs")
+        self.assertQuantity("½–1 tsp chili", 0.5, "tsp chili")
+
+    def test_number_words_and_defaults(self):
+        self.assertQuantity("eggs, two large", 2, "eggs, large")
+        self.assertQuantity("salt", 1, "salt")
+        self.assertQuantity("1/0 cup oil", 1, "cup oil")
+
+
+class NLPModelRegistryTests(SimpleTestCase):
+    PIPELINES = {
+        "ingredients": {"model": "en_core_web_sm", "exclude": ["ner"]},
+        "full": {"model": "en_core_web_sm"},
+    }
+
+    def setUp(self):
+        self.registry = NLPModelRegistry(self.PIPELINES)
+        patcher = mock.patch("spacy.load")
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.load.side_effect = lambda model, exclude: mock.Mock(
+            pipe_names=["tok2vec"]
+        )
+
+    def test_pipelines_are_loaded_lazily_and_once(self):
+        self.load.assert_not_called()
+
+        model = self.registry.get("ingredients")
+
+        self.assertIs(self.registry.get("ingredients"), model)
+        self.load.assert_called_once_with("en_core_web_sm", exclude=["ner"])
+
+    def test_warm_up_loads_every_pipeline(self):
+        self.registry.warm_up()
+
+        self.assertEqual(self.load.call_count, 2)
+        self.registry.get("full")
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_warm_up_loads_only_the_given_pipelines(self):
+        self.registry.warm_up(["full"])
+
+        self.load.assert_called_once_with("en_core_web_sm", exclude=[])
+
+    def test_clear_forces_a_reload(self):
+        self.registry.get("ingredients")
+        self.registry.clear()
+        self.registry.get("ingredients")
+
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_unknown_pipeline(self):
+        with self.assertRaises(ValueError):
+            self.registry.get("unknown")
@@ -1,15 +1,23 @@
 from django.urls import path
 
 from .views import (
+    ArchiveImportJobDetailView,
     IngredientAutocompleteView,
     PublicRecipeListView,
+    RecipeArchiveUploadView,
+    RecipeDetailReadOnlyView,
     RecipeDetailUpdateDeleteView,
+    RecipeExportView,
+    RecipeImportView,
     RecipeListView,
     RecipeRatingCreateUpdateView,
     RecipeRatingDetailView,
     RecipeUploadView,
     RecommendRecipesDBView,
+    ResponseCacheStatsView,
     UnitListView,
+    UploadCacheStatsView,
+    UploadJobDetailView,
 )
 
 urlpatterns = [
@@ -24,12 +32,48 @@ urlpatterns = [
         RecipeDetailUpdateDeleteView.as_view(),
         name="recipe_detail",
     ),
+    path(
+        "public_recipe_detail/<int:pk>/",
+        RecipeDetailReadOnlyView.as_view(),
+        name="public_recipe_detail",
+    ),
     path(
         "ingredients-autocomplete/",
         IngredientAutocompleteView.as_view(),
         name="ingredient-autocomplete",
     ),
     path("upload/", RecipeUploadView.as_view(), name="file_upload_recipe"),
+    path(
+        "upload_archive/",
+        RecipeArchiveUploadView.as_view(),
+        name="archive_upload_recipes",
+    ),
+    path(
+        "archive_import_jobs/<int:pk>/",
+        ArchiveImportJobDetailView.as_view(),
+        name="archive_import_job_detail",
+    ),
+    path(
+        "upload_jobs/<int:pk>/",
+        UploadJobDetailView.as_view(),
+        name="upload_job_detail",
+    ),
+    path(
+        "upload_cache_stats/",
+        UploadCacheStatsView.as_view(),
+        name="upload_cache_stats",
+    ),
+    path(
+        "response_cache_stats/",
+        ResponseCacheStatsView.as_view(),
+        name="response_cache_stats",
+    ),
+    path("import/", RecipeImportView.as_view(), name="recipe_import"),
+    path(
+        "export/<str:file_format>/",
+        RecipeExportView.as_view(),
+        name="recipe_export",
+    ),
     path("units/", UnitListView.as_view(), name="unit-list"),
     path(
         "recommend_recipes_db/",
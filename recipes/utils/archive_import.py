@@ -0,0 +1,178 @@
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from recipes.constants import MAX_UPLOAD_SIZE, RECIPE_FILE_EXTENSIONS
+from recipes.utils.extraction_sandbox import extract_text_sandboxed
+from recipes.utils.ingredient_normalization import normalize_parsed_recipes
+from recipes.utils.recipe_processing import (
+    logger,
+    parse_recipe_text,
+    persist_recipes,
+)
+from recipes.utils.unit_lexicon import unit_lexicon
+
+"""
+File used to keep logic related to importing a ZIP archive of recipe files.
+
+Archive members are read one at a time and fanned out to a thread pool.
+Each thread hands its file to the extraction sandbox, whose worker
+processes do the extraction in parallel, then parses the text. Recipes
+are saved PERSIST_BATCH_SIZE at a time. Every step can fail for a single
+file without affecting the others.
+"""
+
+PERSIST_BATCH_SIZE = 50
+
+
+def _extract_and_parse_member(name: str, data: bytes) -> dict:
+    ext = os.path.splitext(name)[1].lower()
+    text = extract_text_sandboxed(data, ext)
+    if not text:
+        raise ValueError("Could not extract any text from the file.")
+    # Names are normalized for the whole archive at once
+    return parse_recipe_text(text, normalize=False)
+
+
+def _process_member(index: int, name: str, data: bytes):
+    try:
+        return index, name, _extract_and_parse_member(name, data), None
+    except Exception as exc:
+        return index, name, None, str(exc)
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+    ext = os.path.splitext(info.filename)[1].lower()
+    if ext not in RECIPE_FILE_EXTENSIONS:
+        return None, "Unsupported file extension."
+    if info.file_size > MAX_UPLOAD_SIZE:
+        return None, "File too large. Max size is 15MB."
+    try:
+        return archive.read(info), None
+    except Exception as exc:
+        # Corrupt (bad CRC), encrypted or unsupported compression
+        return None, f"Could not read the file from the archive: {exc}"
+
+
+def _iter_members(archive: zipfile.ZipFile):
+    """
+    Yield (index, name, bytes, error) for every file in the archive,
+    reading one member at a time. The index tells apart members with the
+    same name.
+    """
+    infos = (
+        info
+        for info in archive.infolist()
+        if not info.is_dir()
+        and not os.path.basename(info.filename).startswith(".")
+    )
+    for index, info in enumerate(infos):
+        yield (index, info.filename, *_read_member(archive, info))
+
+
+def _process_members(members, workers: int):
+    """
+    Yield (index, name, parsed, error) for every member, keeping at most a
+    couple of files per worker in flight so memory stays bounded.
+    """
+    # Load the units once here, so the threads never open DB connections
+    unit_lexicon.fallback_unit
+    max_in_flight = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for index, name, data, error in members:
+            if error is not None:
+                yield index, name, None, error
+                continue
+            in_flight.add(executor.submit(_process_member, index, name, data))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in in_flight:
+            yield future.result()
+
+
+def _save(members, user, privacy, results):
+    recipes = persist_recipes(
+        [parsed for _, _, parsed in members], user, privacy
+    )
+    for (index, name, _), recipe in zip(members, recipes):
+        results[index] = {"file": name, "recipe": recipe.pk, "error": None}
+
+
+def _persist_batch(batch, user, privacy, results):
+    """
+    Save the parsed recipes of `batch`, a list of (index, name, parsed),
+    and record the outcome of each file in `results`. When the names
+    cannot be normalized every file of the batch fails. When saving the
+    batch fails, its recipes are saved one at a time so only the files
+    that cannot be saved are reported as failed.
+    """
+    try:
+        normalize_parsed_recipes(parsed for _, _, parsed in batch)
+    except Exception as exc:
+        logger.error(f"Could not normalize {len(batch)} archive files: {exc}")
+        for index, name, _ in batch:
+            results[index] = {"file": name, "recipe": None, "error": str(exc)}
+        return
+
+    try:
+        _save(batch, user, privacy, results)
+        return
+    except DatabaseError as exc:
+        logger.warning(f"Saving {len(batch)} archive files one by one: {exc}")
+    for member in batch:
+        try:
+            _save([member], user, privacy, results)
+        except DatabaseError as exc:
+            index, name, _ = member
+            results[index] = {"file": name, "recipe": None, "error": str(exc)}
+
+
+def import_recipe_archive(archive_file, user, privacy="private") -> dict:
+    """
+    Create one recipe per PDF/DOCX file of a ZIP archive.
+    Returns the per-file results (recipe id or error), in archive order,
+    and throughput. Raises BadZipFile when `archive_file` is not a ZIP
+    archive.
+    """
+    start = time.perf_counter()
+    workers = settings.ARCHIVE_UPLOAD_WORKERS
+
+    results = {}
+    batch = []
+    with zipfile.ZipFile(archive_file) as archive:
+        total_bytes = sum(info.file_size for info in archive.infolist())
+        for index, name, parsed, error in _process_members(
+            _iter_members(archive), workers
+        ):
+            if error is not None:
+                results[index] = {"file": name, "recipe": None, "error": error}
+                continue
+            batch.append((index, name, parsed))
+            if len(batch) >= PERSIST_BATCH_SIZE:
+                _persist_batch(batch, user, privacy, results)
+                batch = []
+    if batch:
+        _persist_batch(batch, user, privacy, results)
+
+    created = sum(result["recipe"] is not None for result in results.values())
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Imported {created} of {len(results)} archive files "
+        f"in {elapsed:.2f}s with {workers} workers."
+    )
+    return {
+        "results": [results[index] for index in sorted(results)],
+        "files": len(results),
+        "created": created,
+        "failed": len(results) - created,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(results) / elapsed, 2),
+        "bytes_per_second": round(total_bytes / elapsed),
+    }
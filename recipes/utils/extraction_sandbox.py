@@ -0,0 +1,283 @@
+import atexit
+import io
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from contextlib import closing
+
+import django
+import psutil
+from django.conf import settings
+
+from recipes.utils.file_extraction import ExtractionError, iter_text_from_file
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+"""
+File used to run text extraction in isolated worker processes.
+
+PyMuPDF and python-docx run native code on untrusted files, so a
+malformed document can hang or exhaust the memory of the process parsing
+it. Jobs are sent to a small pool of subprocesses instead: a job running
+past EXTRACTION_TIMEOUT_SECONDS or above EXTRACTION_MEMORY_LIMIT_MB of RSS
+(counting the processes the worker started) has its worker killed and
+replaced, and workers are recycled after
+EXTRACTION_MAX_JOBS_PER_WORKER jobs. The timeout starts once the worker
+is ready, so spawning it is not counted. Failures are raised as
+ExtractionError with a code describing what happened.
+"""
+
+logger = logging.getLogger(__name__)
+
+# How often a running job's memory use is checked
+RSS_CHECK_INTERVAL = 0.1
+# How long a new worker may take to import and set up Django
+WORKER_START_TIMEOUT = 60
+
+EXTRACT_RECIPE = "recipe"
+EXTRACT_DOCUMENT = "document"
+
+
+def _run_job(source, file_type: str, mode: str) -> str:
+    from recipes.utils.recipe_processing import take_recipe_pages
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if mode == EXTRACT_RECIPE:
+        # Stop reading once the recipe is complete
+        with closing(iter_text_from_file(source, file_type)) as pages:
+            return take_recipe_pages(pages)
+    # Long PDFs on disk are extracted by a process pool, whose processes
+    # count towards the worker's memory and are killed with it
+    return "".join(iter_text_from_file(source, file_type, parallel=True))
+
+
+def _worker_main(conn, memory_limit_mb: int):
+    # Spawned workers start from a fresh interpreter
+    django.setup()
+    if resource is not None:
+        # Hard backstop in case a single allocation outruns the RSS checks
+        limit = memory_limit_mb * 2 * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            conn.send(("ok", _run_job(*job)))
+        except MemoryError:
+            conn.send(("memory_limit", "File needs too much memory."))
+        except ExtractionError as exc:
+            conn.send((exc.code, exc.message))
+        except Exception as exc:
+            conn.send(("extraction_failed", str(exc)))
+
+
+class _SandboxWorker:
+    def __init__(self, context, memory_limit_mb: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb),
+            name="extraction-sandbox",
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.jobs = 0
+        # Processes started by the worker (see _run_job), remembered so
+        # they can be killed even after the worker itself died
+        self.children = {}
+
+    def start_job(self, job):
+        """
+        Send a job once the worker is ready. Raises EOFError or OSError
+        when the worker has died.
+        """
+        if not self.ready:
+            if not self.conn.poll(WORKER_START_TIMEOUT):
+                raise ExtractionError(
+                    "timeout",
+                    f"Extraction worker did not start within "
+                    f"{WORKER_START_TIMEOUT}s.",
+                )
+            self.conn.recv()
+            self.ready = True
+        self.conn.send(job)
+
+    def rss(self) -> int:
+        """
+        Memory used by the worker and every process it started.
+        """
+        try:
+            process = psutil.Process(self.process.pid)
+            children = process.children(recursive=True)
+            rss = process.memory_info().rss
+        except psutil.Error:
+            return 0
+        for child in children:
+            self.children[child.pid] = child
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def stop(self):
+        try:
+            for child in psutil.Process(self.process.pid).children(
+                recursive=True
+            ):
+                self.children[child.pid] = child
+        except psutil.Error:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        for child in self.children.values():
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ExtractionSandbox:
+    def __init__(
+        self, workers: int, timeout: float, memory_limit_mb: int, max_jobs
+    ):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs = max_jobs
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(workers)
+
+    def _acquire(self) -> _SandboxWorker:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return _SandboxWorker(self._context, self.memory_limit_mb)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: _SandboxWorker, reusable: bool):
+        if reusable and worker.jobs < self.max_jobs:
+            # A finished job has shut down the processes it started
+            worker.children = {}
+            self._idle.put(worker)
+        else:
+            worker.stop()
+        self._slots.release()
+
+    def extract(self, source, file_type: str, mode=EXTRACT_RECIPE) -> str:
+        """
+        Extract the text of a file (a path or its bytes) in a sandbox
+        worker. With EXTRACT_RECIPE reading stops once the recipe is
+        complete, EXTRACT_DOCUMENT reads every page.
+        """
+        job = (source, file_type, mode)
+        worker = self._acquire()
+        reusable = False
+        try:
+            try:
+                worker.start_job(job)
+            except (EOFError, OSError):
+                # Died while idle or starting (e.g. killed by the OOM
+                # killer), retry once with a new worker
+                logger.warning("Replacing dead extraction worker.")
+                worker.stop()
+                worker = _SandboxWorker(self._context, self.memory_limit_mb)
+                worker.start_job(job)
+            status, payload = self._wait_for_result(worker)
+            worker.jobs += 1
+            reusable = True
+        except (EOFError, OSError) as exc:
+            raise ExtractionError(
+                "crashed", "Extraction worker stopped unexpectedly."
+            ) from exc
+        finally:
+            self._release(worker, reusable)
+
+        if status != "ok":
+            raise ExtractionError(status, payload)
+        return payload
+
+    def _wait_for_result(self, worker: _SandboxWorker):
+        memory_limit = self.memory_limit_mb * 1024 * 1024
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning("Killing extraction worker: timeout.")
+                raise ExtractionError(
+                    "timeout",
+                    f"Extraction took longer than {self.timeout}s.",
+                )
+            try:
+                if worker.conn.poll(min(remaining, RSS_CHECK_INTERVAL)):
+                    return worker.conn.recv()
+            except (EOFError, OSError):
+                raise ExtractionError(
+                    "crashed", "Extraction worker stopped unexpectedly."
+                )
+            if worker.rss() > memory_limit:
+                logger.warning("Killing extraction worker: memory limit.")
+                raise ExtractionError(
+                    "memory_limit",
+                    f"Extraction used more than {self.memory_limit_mb}MB.",
+                )
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+
+def get_extraction_sandbox() -> ExtractionSandbox:
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = ExtractionSandbox(
+                workers=settings.EXTRACTION_WORKERS,
+                timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+                memory_limit_mb=settings.EXTRACTION_MEMORY_LIMIT_MB,
+                max_jobs=settings.EXTRACTION_MAX_JOBS_PER_WORKER,
+            )
+            atexit.register(_sandbox.shutdown)
+        return _sandbox
+
+
+def extract_text_sandboxed(source, file_type: str, mode=EXTRACT_RECIPE):
+    """
+    Extract the text of a file, isolated from the current process unless
+    EXTRACTION_SANDBOX is turned off.
+    """
+    if not settings.EXTRACTION_SANDBOX:
+        try:
+            return _run_job(source, file_type, mode)
+        except ExtractionError:
+            raise
+        except Exception as exc:
+            raise ExtractionError("extraction_failed", str(exc)) from exc
+    return get_extraction_sandbox().extract(source, file_type, mode)
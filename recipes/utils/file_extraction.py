@@ -1,45 +1,233 @@
-import docx
-import fitz
+import hashlib
+import logging
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+from xml.etree import ElementTree
 
-from recipes.utils.recipe_processing import logger
+import fitz
+from django.conf import settings
 
 """
 File used to keep logic related to extracting text from files.
 """
 
+# Kept free of model imports so sandbox workers can load it before
+# Django is set up
+logger = logging.getLogger(__name__)
+
+W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = f"{W_NAMESPACE}body"
+W_PARAGRAPH = f"{W_NAMESPACE}p"
+W_TEXT = f"{W_NAMESPACE}t"
+W_TAB = f"{W_NAMESPACE}tab"
+W_BREAK = f"{W_NAMESPACE}br"
+W_CARRIAGE_RETURN = f"{W_NAMESPACE}cr"
+W_TABLE = f"{W_NAMESPACE}tbl"
+W_ROW = f"{W_NAMESPACE}tr"
+W_CELL = f"{W_NAMESPACE}tc"
+
+
+class ExtractionError(Exception):
+    """
+    Raised when the text of a file can't be extracted. `code` tells why:
+    unsupported_file, extraction_failed, timeout, memory_limit or crashed.
+    """
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+    def as_dict(self) -> dict:
+        return {"code": self.code, "message": self.message}
+
 
-def extract_text_from_file(file_obj: str, file_type: str) -> str:
-    # TODO: allow multiple recipes to come from a signle file?
+def extract_text_from_file(file_obj, file_type: str) -> str:
+    """
+    Extract the whole text of a file in this process. Untrusted uploads
+    should go through recipes.utils.extraction_sandbox instead.
+    """
     logger.info(f"Attempting to extract text from {file_type} file.")
     try:
-        if file_type == ".pdf":
-            return _extract_text_from_pdf(file_obj)
-        elif file_type == ".docx":
-            return _extract_text_from_docx(file_obj)
-        else:
-            logger.warning(f"Unsupported file type: {file_type}")
-            raise ValueError(f"Unsupported file type: {file_type}")
+        return "".join(iter_text_from_file(file_obj, file_type, parallel=True))
+    except ExtractionError:
+        raise
     except Exception as exc:
         logger.error(f"Error extracting text from file: {exc}")
+        raise ExtractionError("extraction_failed", str(exc)) from exc
 
 
-def _extract_text_from_docx(file_obj: str) -> str:
-    doc = docx.Document(file_obj)
-    text = "\n".join([para.text for para in doc.paragraphs])
-    logger.info(
-        f"Extracted text from DOCX with {len(doc.paragraphs)} paragraphs."
-    )
+def iter_text_from_file(
+    file_obj, file_type: str, parallel: bool = False
+) -> Iterator[str]:
+    """
+    Yield the text of a file chunk by chunk (one chunk per PDF page), so
+    callers can stop reading once they have what they need.
+    `file_obj` is either a path or a file object. With `parallel`, long
+    PDFs on disk are extracted by a process pool (see
+    _iter_text_from_pdf_parallel), which is faster when every page is
+    needed but gives up the early exit.
+    """
+    if file_type == ".pdf":
+        path = _get_file_path(file_obj)
+        if parallel and path:
+            return _iter_text_from_pdf_parallel(path)
+        return _iter_text_from_pdf(file_obj)
+    elif file_type == ".docx":
+        return _iter_text_from_docx(file_obj)
+    else:
+        logger.warning(f"Unsupported file type: {file_type}")
+        raise ExtractionError(
+            "unsupported_file", f"Unsupported file type: {file_type}"
+        )
+
+
+def file_sha256(file_obj) -> str:
+    """
+    Hash an uploaded file chunk by chunk, without loading it in memory.
+    """
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
     file_obj.seek(0)
-    return text
+    return digest.hexdigest()
 
 
-def _extract_text_from_pdf(file_obj: str) -> str:
-    text = ""
-    file_bytes = file_obj.read()
-    with fitz.open(stream=file_bytes) as doc:
-        for page in doc:
-            text += page.get_text()
-        logger.info(f"Extracted text from PDF with {len(doc)} pages.")
+def _get_file_path(file_obj):
+    """
+    Return a path PyMuPDF can open directly, if the file lives on disk.
+    """
+    if isinstance(file_obj, str):
+        return file_obj
+    if hasattr(file_obj, "temporary_file_path"):
+        # Large Django uploads are spooled to a temporary file
+        return file_obj.temporary_file_path()
+    return None
 
-    file_obj.seek(0)
-    return text
+
+def _iter_text_from_docx(file_obj) -> Iterator[str]:
+    """
+    Stream the body of a DOCX file out of word/document.xml with an
+    incremental XML parser, without building the python-docx object model.
+    Paragraphs are yielded in document order, one line each; every table
+    row becomes one line with its cells separated by spaces, since recipe
+    templates often keep quantity, unit and ingredient in separate cells.
+    """
+    source = _get_file_path(file_obj) or file_obj
+    paragraphs = 0
+    with zipfile.ZipFile(source) as archive:
+        with archive.open("word/document.xml") as xml_file:
+            depth = 0
+            body_depth = None
+            body = None
+            table_depth = 0
+            text_parts = []
+            cell_parts = []
+            row_cells = []
+
+            for event, elem in ElementTree.iterparse(
+                xml_file, events=("start", "end")
+            ):
+                if event == "start":
+                    depth += 1
+                    if elem.tag == W_BODY:
+                        body, body_depth = elem, depth
+                    elif elem.tag == W_TABLE:
+                        table_depth += 1
+                    continue
+
+                depth -= 1
+                if elem.tag == W_TEXT:
+                    text_parts.append(elem.text or "")
+                elif elem.tag == W_TAB:
+                    text_parts.append(" ")
+                elif elem.tag in (W_BREAK, W_CARRIAGE_RETURN):
+                    text_parts.append("\n")
+                elif elem.tag == W_PARAGRAPH:
+                    paragraph = "".join(text_parts).strip()
+                    text_parts = []
+                    paragraphs += 1
+                    if table_depth:
+                        cell_parts.append(paragraph)
+                    else:
+                        yield paragraph + "\n"
+                elif elem.tag == W_CELL and table_depth == 1:
+                    row_cells.append(" ".join(p for p in cell_parts if p))
+                    cell_parts = []
+                elif elem.tag == W_ROW and table_depth == 1:
+                    yield " ".join(c for c in row_cells if c) + "\n"
+                    row_cells = []
+                elif elem.tag == W_TABLE:
+                    table_depth -= 1
+
+                # Drop finished top level elements to keep memory flat
+                if body is not None and depth == body_depth:
+                    body.clear()
+
+    logger.info(f"Extracted text from DOCX with {paragraphs} paragraphs.")
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+
+
+def _iter_text_from_pdf(file_obj) -> Iterator[str]:
+    path = _get_file_path(file_obj)
+    if path:
+        doc = fitz.open(path)
+    else:
+        doc = fitz.open(stream=file_obj.read())
+        file_obj.seek(0)
+
+    with doc:
+        pages_read = 0
+        try:
+            for page in doc:
+                pages_read += 1
+                yield page.get_text()
+        finally:
+            logger.info(
+                f"Extracted text from {pages_read} of {len(doc)} PDF pages."
+            )
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    # Runs in a pool worker, each worker opens the document on its own
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _iter_text_from_pdf_parallel(path: str) -> Iterator[str]:
+    """
+    Split the pages of a PDF in ranges extracted by a process pool and
+    yield the page texts back in page order. Documents shorter than
+    PDF_PARALLEL_PAGE_THRESHOLD pages are extracted serially, where the
+    pool start-up would cost more than it saves.
+    """
+    with fitz.open(path) as doc:
+        page_count = len(doc)
+
+    workers = settings.PDF_EXTRACTION_WORKERS
+    if (
+        page_count < settings.PDF_PARALLEL_PAGE_THRESHOLD
+        or workers < 2
+        # Daemon processes (e.g. Celery prefork workers) can't start a pool
+        or multiprocessing.current_process().daemon
+    ):
+        yield from _iter_text_from_pdf(path)
+        return
+
+    # A few ranges per worker keeps the pool busy when pages vary in cost
+    range_size = max(1, -(-page_count // (workers * 4)))
+    starts = list(range(0, page_count, range_size))
+    stops = [min(start + range_size, page_count) for start in starts]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for page_texts in executor.map(
+            _extract_page_range, [path] * len(starts), starts, stops
+        ):
+            yield from page_texts
+    logger.info(
+        f"Extracted text from {page_count} PDF pages "
+        f"with {workers} workers."
+    )
@@ -0,0 +1,199 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from recipes.models import Ingredient, RecipeIngredient
+
+"""
+File used to keep the in-memory ingredient autocomplete index.
+
+Every lowercased ingredient name, and every word start inside it (so "oni"
+finds "red onion"), is kept in one sorted list: the keys starting with a
+prefix are a contiguous slice found by bisection, a flattened prefix trie
+that costs one tuple per key instead of one node per character. The
+slice is ranked by how many recipe ingredients use each ingredient; the
+ranking of prefixes matching many keys (the first keystrokes) is computed
+once and memoized. When no name starts with the query (typos), the
+ingredients containing most of the query's trigrams are suggested instead.
+
+The index is built once per process, like the unit lexicon. New
+ingredients are added in place (see recipes.signals and
+get_or_create_ingredients); renames and deletions rebuild it, and it is
+rebuilt after INGREDIENT_INDEX_MAX_AGE_SECONDS so usage ranks and names
+created by other processes catch up.
+"""
+
+logger = logging.getLogger(__name__)
+
+SUGGESTIONS_PER_PREFIX = 10
+# Prefixes matching more keys than this have their ranking memoized
+MAX_RANKED_SCAN = 256
+# Trigrams shared by more names than this don't tell names apart and are
+# not used to find fuzzy candidates, like stop words
+MAX_TRIGRAM_POSTINGS = 5000
+FUZZY_CANDIDATES = 200
+MIN_SIMILARITY = 0.5
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _word_starts(name: str):
+    yield name
+    for i, char in enumerate(name):
+        if char == " ":
+            yield name[i + 1 :]
+
+
+def _trigrams(text: str) -> set:
+    # Per word, padded like pg_trgm
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _IndexState:
+    def __init__(self, names: dict, usage: dict):
+        self.names = names
+        self.usage = usage
+        # Sorted (key, ingredient id) tuples
+        self.keys = sorted(
+            (start, pk)
+            for pk, name in names.items()
+            for start in _word_starts(_normalize(name))
+        )
+        self.trigrams = {}
+        for pk, name in names.items():
+            for gram in _trigrams(_normalize(name)):
+                self.trigrams.setdefault(gram, []).append(pk)
+        self.ranked = {}
+        self.built_at = time.monotonic()
+
+    def rank(self, pk):
+        name = self.names[pk]
+        return -self.usage.get(pk, 0), len(name), name
+
+    def insert(self, pk, name):
+        self.names[pk] = name
+        key = _normalize(name)
+        for start in _word_starts(key):
+            # One list insert, so readers never see a half-added key
+            bisect.insort(self.keys, (start, pk))
+            for end in range(len(start) + 1):
+                ranked = self.ranked.get(start[:end])
+                if ranked is not None:
+                    self.ranked[start[:end]] = sorted(
+                        {*ranked, pk}, key=self.rank
+                    )[:SUGGESTIONS_PER_PREFIX]
+        for gram in _trigrams(key):
+            self.trigrams.setdefault(gram, []).append(pk)
+
+    def prefix_matches(self, prefix) -> list:
+        ranked = self.ranked.get(prefix)
+        if ranked is not None:
+            return ranked
+        lo = bisect.bisect_left(self.keys, (prefix,))
+        hi = bisect.bisect_left(self.keys, (prefix + "\U0010ffff",))
+        ranked = heapq.nsmallest(
+            SUGGESTIONS_PER_PREFIX,
+            {pk for _, pk in self.keys[lo:hi]},
+            key=self.rank,
+        )
+        if hi - lo > MAX_RANKED_SCAN:
+            self.ranked[prefix] = ranked
+        return ranked
+
+    def fuzzy_matches(self, query) -> list:
+        grams = _trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            postings = self.trigrams.get(gram, ())
+            if len(postings) <= MAX_TRIGRAM_POSTINGS:
+                shared.update(postings)
+
+        scored = []
+        for pk, _ in shared.most_common(FUZZY_CANDIDATES):
+            name_grams = _trigrams(_normalize(self.names[pk]))
+            common = len(grams & name_grams)
+            # Share of the query found in the name, which may be longer
+            # than what has been typed so far; closer lengths break ties
+            similarity = common / len(grams)
+            if similarity >= MIN_SIMILARITY:
+                jaccard = common / len(grams | name_grams)
+                scored.append((-similarity, -jaccard, *self.rank(pk), pk))
+        return [entry[-1] for entry in sorted(scored)]
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _build(self):
+        start = time.perf_counter()
+        usage = dict(
+            RecipeIngredient.objects.values_list("ingredient")
+            .annotate(count=Count("id"))
+            .values_list("ingredient", "count")
+        )
+        names = dict(Ingredient.objects.values_list("id", "name"))
+        state = _IndexState(names, usage)
+
+        logger.info(
+            f"Built ingredient index with {len(names)} names in "
+            f"{time.perf_counter() - start:.2f}s."
+        )
+        return state
+
+    def _ensure_loaded(self):
+        state = self._state
+        max_age = settings.INGREDIENT_INDEX_MAX_AGE_SECONDS
+        if state is not None and time.monotonic() - state.built_at < max_age:
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or time.monotonic() - state.built_at >= max_age:
+                self._state = state = self._build()
+            return state
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+    def add(self, ingredients):
+        """
+        Add newly created ingredients. Nothing to do before the index is
+        built, the build will read them.
+        """
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+            for ingredient in ingredients:
+                if ingredient.pk not in state.names:
+                    state.insert(ingredient.pk, ingredient.name)
+
+    def search(self, query: str, limit: int = 5) -> list:
+        """
+        Ingredients whose name, or a word in it, starts with the query,
+        most used first, or fuzzy matches when there are none.
+        Returns: [(id, name)]
+        """
+        state = self._ensure_loaded()
+        query = _normalize(query)
+        ids = state.prefix_matches(query)
+        if not ids and query:
+            ids = state.fuzzy_matches(query)
+        return [(pk, state.names[pk]) for pk in ids[:limit]]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,147 @@
+import threading
+
+from cachetools import LRUCache
+from django.conf import settings
+
+from recipes.utils.nlp_models import nlp_models
+
+"""
+File used to turn the raw ingredient names left over by
+parse_ingredient_lines ("large onions finely", "tomatoes,") into canonical
+names ("onion", "tomato"), so the Ingredient table doesn't fill up with
+near-duplicates.
+
+All names of an upload are sent through spaCy's nlp.pipe in one batch,
+and results are memoized per raw string.
+"""
+
+# Words describing size, preparation or freshness rather than the
+# ingredient itself
+MODIFIER_WORDS = {
+    "large",
+    "small",
+    "medium",
+    "big",
+    "fresh",
+    "freshly",
+    "finely",
+    "roughly",
+    "thinly",
+    "coarsely",
+    "chopped",
+    "chop",
+    "minced",
+    "mince",
+    "sliced",
+    "slice",
+    "diced",
+    "dice",
+    "grated",
+    "grate",
+    "crushed",
+    "crush",
+    "peeled",
+    "peel",
+    "halved",
+    "softened",
+    "melted",
+    "beaten",
+    "packed",
+    "heaping",
+    "level",
+    "optional",
+}
+
+# Stop words (often tagged DET or ADV) that are part of an ingredient name,
+# as in "all purpose flour", "whole milk" or "back bacon"
+KEPT_WORDS = {"all", "whole", "full", "top", "bottom", "back"}
+
+# Parts of speech that never belong in an ingredient name
+DROPPED_POS = {
+    "ADV",
+    "ADP",
+    "AUX",
+    "CCONJ",
+    "DET",
+    "NUM",
+    "PART",
+    "PRON",
+    "PUNCT",
+    "SCONJ",
+    "SYM",
+}
+
+CACHE_SIZE = 10_000
+
+_cache = LRUCache(maxsize=CACHE_SIZE)
+_cache_lock = threading.Lock()
+
+
+def _canonical_name(doc) -> str:
+    words = []
+    for token in doc:
+        lemma = token.lemma_.lower()
+        if token.lower_ in KEPT_WORDS:
+            words.append(token.lower_)
+            continue
+        if (
+            token.is_punct
+            or token.like_num
+            or token.is_stop
+            or token.pos_ in DROPPED_POS
+            or lemma in MODIFIER_WORDS
+            or token.lower_ in MODIFIER_WORDS
+        ):
+            continue
+        # Singular nouns ("onions" -> "onion"), other words as written
+        words.append(lemma if token.pos_ == "NOUN" else token.lower_)
+    return " ".join(words)
+
+
+def normalize_ingredient_names(names) -> list:
+    """
+    Return the canonical name of every raw ingredient name, in order.
+    Names not seen before go through nlp.pipe in a single batch; a name
+    that normalizes to nothing is kept as it was.
+    """
+    names = list(names)
+    canonical = {}
+    with _cache_lock:
+        for name in set(names):
+            if name in _cache:
+                canonical[name] = _cache[name]
+
+    missing = [name for name in dict.fromkeys(names) if name not in canonical]
+    if missing:
+        nlp = nlp_models.get("ingredients")
+        docs = nlp.pipe(
+            missing,
+            batch_size=settings.INGREDIENT_NORMALIZER_BATCH_SIZE,
+            n_process=settings.INGREDIENT_NORMALIZER_PROCESSES,
+        )
+        normalized = {
+            name: _canonical_name(doc) or name
+            for name, doc in zip(missing, docs)
+        }
+        canonical.update(normalized)
+        with _cache_lock:
+            _cache.update(normalized)
+
+    return [canonical[name] for name in names]
+
+
+def normalize_parsed_recipes(parsed_recipes) -> list:
+    """
+    Replace the ingredient names of parsed recipes (see
+    parse_recipe_text) with their canonical names, in one batch.
+    """
+    parsed_recipes = list(parsed_recipes)
+    ingredients = [
+        ing for parsed in parsed_recipes for ing in parsed["ingredients"]
+    ]
+    canonical_names = normalize_ingredient_names(
+        ing["name"] for ing in ingredients
+    )
+    for ing, name in zip(ingredients, canonical_names):
+        ing["name"] = name
+    return parsed_recipes
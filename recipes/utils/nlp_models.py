@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+"""
+File used to keep a lazy registry of the NLP models used when parsing
+recipes.
+
+spaCy is heavy to import and its models are slow to load, so nothing is
+imported or loaded here until a pipeline is first requested.
+Plain API workers never pay that cost; upload workers can load everything
+up front through warm_up().
+"""
+
+logger = logging.getLogger(__name__)
+
+# Pipelines the app can ask for, with only the components they need.
+PIPELINES = {
+    "ingredients": {
+        "model": "en_core_web_sm",
+        "exclude": ["parser", "ner"],
+    },
+}
+
+
+class NLPModelRegistry:
+    def __init__(self, pipelines=None):
+        self.pipelines = pipelines or PIPELINES
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str = "ingredients"):
+        """
+        Return the spaCy pipeline registered under `name`, loading it
+        the first time it is requested.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+            model = self._models[name] = self._load(name)
+        return model
+
+    def _load(self, name: str):
+        if name not in self.pipelines:
+            raise ValueError(f"Unknown NLP pipeline: {name}")
+        import spacy
+
+        config = self.pipelines[name]
+
+        start = time.perf_counter()
+        model = spacy.load(config["model"], exclude=config.get("exclude", []))
+        logger.info(
+            f"Loaded NLP pipeline {name} ({config['model']}) with "
+            f"components {model.pipe_names} in "
+            f"{time.perf_counter() - start:.2f}s."
+        )
+        return model
+
+    def warm_up(self, names=None):
+        """
+        Load the given pipelines (all by default), so the first upload
+        handled by a worker does not pay for them.
+        """
+        for name in names or self.pipelines:
+            self.get(name)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+nlp_models = NLPModelRegistry()
@@ -0,0 +1,37 @@
+import django
+
+"""
+File used to parse stored recipe text in worker processes (see the
+reparse_uploads command), so CPU-bound parsing is not serialized by the
+GIL.
+
+Spawned workers import this module before django.setup() has run, so
+nothing touching the models is imported at module level.
+"""
+
+
+def init_worker():
+    # Spawned workers start from a fresh interpreter
+    django.setup()
+
+
+def reparse_text(extracted_text: str, multiple_recipes: bool):
+    """
+    Parse stored text again without normalizing ingredient names, which
+    is done for a whole batch at once by the caller.
+    Returns: (extracted_text, parse_result, error)
+    """
+    from recipes.tasks import parse_uploaded_file
+
+    try:
+        return (
+            *parse_uploaded_file(
+                None,
+                multiple_recipes,
+                extracted_text=extracted_text,
+                normalize=False,
+            ),
+            None,
+        )
+    except Exception as exc:
+        return None, None, str(exc)
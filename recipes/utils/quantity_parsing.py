@@ -0,0 +1,127 @@
+import re
+
+"""
+File used to keep the quantity grammar used when parsing ingredient lines.
+
+A single precompiled pattern reads the quantity at the start of a line:
+integers, decimals (1.5, .5, 1,5), thousands (1,000), fractions (1/2),
+mixed numbers (1 1/2, 1½), unicode fractions (½) and ranges (2-3, 2 to
+3). Lines without one fall back to a number word anywhere in the line
+("eggs, two large"), like the parser always did. Values are computed by
+hand, never with eval.
+"""
+
+DEFAULT_QUANTITY = 1.0
+
+UNICODE_FRACTIONS = {
+    "½": 1 / 2,
+    "⅓": 1 / 3,
+    "⅔": 2 / 3,
+    "¼": 1 / 4,
+    "¾": 3 / 4,
+    "⅕": 1 / 5,
+    "⅖": 2 / 5,
+    "⅗": 3 / 5,
+    "⅘": 4 / 5,
+    "⅙": 1 / 6,
+    "⅚": 5 / 6,
+    "⅛": 1 / 8,
+    "⅜": 3 / 8,
+    "⅝": 5 / 8,
+    "⅞": 7 / 8,
+}
+
+NUMBER_WORDS = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+    "dozen": 12,
+}
+
+_FRACTIONS = "".join(UNICODE_FRACTIONS)
+
+THOUSANDS_PATTERN = re.compile(r"\d{1,3}(?:,\d{3})+")
+
+
+def _number_pattern(name: str) -> str:
+    return (
+        r"(?:"
+        rf"(?P<{name}_whole>\d+)\s+(?P<{name}_num>\d+)/(?P<{name}_den>\d+)"
+        rf"|(?P<{name}_mixed>\d+)?\s*(?P<{name}_ufrac>[{_FRACTIONS}])"
+        rf"|(?P<{name}_fnum>\d+)/(?P<{name}_fden>\d+)"
+        # A comma is a thousands separator before three digits ("1,000"),
+        # else a decimal comma ("1,5")
+        rf"|(?P<{name}_dec>\d{{1,3}}(?:,\d{{3}})+(?!\d)"
+        r"|\d+,\d+|\d*\.\d+|\d+)"
+        r")"
+    )
+
+
+QUANTITY_PATTERN = re.compile(
+    r"^\s*"
+    + _number_pattern("first")
+    + r"(?:(?:\s*[-–]\s*|\s+to\s+)"
+    + _number_pattern("second")
+    + r")?"
+)
+NUMBER_WORD_PATTERN = re.compile(
+    r"\b(" + "|".join(NUMBER_WORDS) + r")\b", re.I
+)
+
+
+def _number_value(match, prefix: str):
+    group = match.groupdict()
+    if group[f"{prefix}_whole"] is not None:
+        denominator = int(group[f"{prefix}_den"])
+        if not denominator:
+            return None
+        return int(group[f"{prefix}_whole"]) + (
+            int(group[f"{prefix}_num"]) / denominator
+        )
+    if group[f"{prefix}_ufrac"] is not None:
+        whole = int(group[f"{prefix}_mixed"] or 0)
+        return whole + UNICODE_FRACTIONS[group[f"{prefix}_ufrac"]]
+    if group[f"{prefix}_fnum"] is not None:
+        denominator = int(group[f"{prefix}_fden"])
+        if not denominator:
+            return None
+        return int(group[f"{prefix}_fnum"]) / denominator
+    decimal = group[f"{prefix}_dec"]
+    if decimal is not None:
+        if THOUSANDS_PATTERN.fullmatch(decimal):
+            return float(decimal.replace(",", ""))
+        return float(decimal.replace(",", "."))
+    return None
+
+
+def parse_quantity(text: str):
+    """
+    Read the quantity of an ingredient line.
+    Ranges ("2-3") give their lower bound.
+    Returns: (quantity, text with the quantity removed)
+    """
+    match = QUANTITY_PATTERN.match(text)
+    if match:
+        quantity = _number_value(match, "first")
+        rest = text[match.end() :].strip()
+        return (
+            quantity if quantity is not None else DEFAULT_QUANTITY,
+            rest,
+        )
+
+    word_match = NUMBER_WORD_PATTERN.search(text)
+    if word_match:
+        rest = text[: word_match.start()] + text[word_match.end() :]
+        quantity = float(NUMBER_WORDS[word_match.group(1).lower()])
+        return quantity, " ".join(rest.split())
+
+    return DEFAULT_QUANTITY, text
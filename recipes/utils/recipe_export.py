@@ -0,0 +1,116 @@
+import csv
+import io
+
+import orjson
+from django.db.models import Prefetch
+
+from recipes.models import Step
+from recipes.utils.recipe_queries import ingredients_prefetch
+
+"""
+File used to stream a user's recipes as NDJSON or CSV.
+
+Recipes are read with QuerySet.iterator(chunk_size), which prefetches the
+ingredients, units and steps of each chunk on its own, and every chunk is
+encoded and handed to the response before the next one is fetched, so
+memory stays flat however big the library is.
+
+NDJSON lines use the shape recipes.utils.recipe_import accepts, so an
+export can be imported again.
+"""
+
+CSV_COLUMNS = [
+    "id",
+    "title",
+    "privacy",
+    "description",
+    "servings",
+    "ingredients",
+    "steps",
+]
+
+
+def _recipes(queryset, chunk_size):
+    return (
+        queryset.order_by("id")
+        .prefetch_related(
+            ingredients_prefetch(),
+            Prefetch("steps", queryset=Step.objects.order_by("order", "id")),
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def recipe_export_row(recipe) -> dict:
+    return {
+        "id": recipe.id,
+        "title": recipe.title,
+        "privacy": recipe.privacy,
+        "description": recipe.description,
+        "servings": recipe.servings,
+        "ingredients": [
+            {
+                "ingredient_name": ri.ingredient.name,
+                "quantity": ri.quantity,
+                "unit_id": ri.unit_id,
+                "unit": ri.unit.abbreviation,
+            }
+            for ri in recipe.recipe_ingredients.all()
+        ],
+        "steps": [
+            {"order": step.order, "text": step.text}
+            for step in recipe.steps.all()
+        ],
+    }
+
+
+def stream_recipes_ndjson(queryset, chunk_size):
+    for chunk in _chunks(_recipes(queryset, chunk_size), chunk_size):
+        yield b"".join(
+            orjson.dumps(recipe_export_row(recipe)) + b"\n" for recipe in chunk
+        )
+
+
+def stream_recipes_csv(queryset, chunk_size):
+    """
+    One row per recipe: ingredients as "quantity unit name" joined with
+    "; " and steps one per line.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    for chunk in _chunks(_recipes(queryset, chunk_size), chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        for recipe in chunk:
+            writer.writerow(
+                [
+                    recipe.id,
+                    recipe.title,
+                    recipe.privacy,
+                    recipe.description,
+                    recipe.servings,
+                    "; ".join(
+                        f"{ri.quantity:g} {ri.unit.abbreviation} "
+                        f"{ri.ingredient.name}"
+                        for ri in recipe.recipe_ingredients.all()
+                    ),
+                    "\n".join(
+                        f"{step.order}. {step.text}"
+                        for step in recipe.steps.all()
+                    ),
+                ]
+            )
+        yield buffer.getvalue()
@@ -0,0 +1,125 @@
+import json
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import Recipe, RecipeIngredient, Step, Unit
+from recipes.response_cache import bump_recipe_versions
+from recipes.serializers import RecipeImportSerializer
+from recipes.utils.recipe_processing import get_or_create_ingredients, logger
+
+"""
+File used to import recipes from newline-delimited JSON, one recipe per
+line in the shape RecipeSerializer accepts.
+
+Lines are read one at a time and validated on their own, so a bad line
+only fails itself. Valid recipes are saved every batch_size recipes with
+set-based queries, each batch in its own transaction, which keeps memory
+flat however long the input is.
+"""
+
+# Errors beyond this are counted but not listed in the report
+MAX_REPORTED_ERRORS = 1000
+
+
+def save_recipe_batch(batch, user) -> list:
+    """
+    Save validated RecipeImportSerializer data with a constant number of
+    queries per batch. Steps are numbered by their position.
+    """
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user=user,
+                    **{
+                        field: value
+                        for field, value in data.items()
+                        if field not in ("recipe_ingredients", "steps")
+                    },
+                )
+                for data in batch
+            ]
+        )
+        ingredients = get_or_create_ingredients(
+            ing["ingredient_name"]
+            for data in batch
+            for ing in data["recipe_ingredients"]
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[ing["ingredient_name"]],
+                    quantity=ing["quantity"],
+                    unit_id=ing["unit_id"],
+                    order=order,
+                )
+                for recipe, data in zip(recipes, batch)
+                for order, ing in enumerate(
+                    data["recipe_ingredients"], start=1
+                )
+            ]
+        )
+        Step.objects.bulk_create(
+            [
+                Step(recipe=recipe, order=order, text=step["text"])
+                for recipe, data in zip(recipes, batch)
+                for order, step in enumerate(data["steps"], start=1)
+            ]
+        )
+        # bulk_create sends no signals
+        bump_recipe_versions(recipe.pk for recipe in recipes)
+    return recipes
+
+
+def import_recipe_lines(lines, user, batch_size=None) -> dict:
+    """
+    Create a recipe for every line of `lines` (bytes or str, e.g. an open
+    file or a request stream). Blank lines are skipped.
+    Returns the counts, the errors of invalid lines and the throughput.
+    """
+    start = time.perf_counter()
+    batch_size = batch_size or settings.RECIPE_IMPORT_BATCH_SIZE
+    context = {"unit_ids": set(Unit.objects.values_list("id", flat=True))}
+
+    created = failed = 0
+    errors = []
+    batch = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            line_errors = {"non_field_errors": [f"Invalid JSON: {exc}"]}
+        else:
+            serializer = RecipeImportSerializer(data=data, context=context)
+            if serializer.is_valid():
+                batch.append(serializer.validated_data)
+                if len(batch) >= batch_size:
+                    created += len(save_recipe_batch(batch, user))
+                    batch = []
+                continue
+            line_errors = serializer.errors
+
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": number, "errors": line_errors})
+
+    if batch:
+        created += len(save_recipe_batch(batch, user))
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Imported {created} recipes ({failed} invalid lines) "
+        f"in {elapsed:.2f}s."
+    )
+    return {
+        "created": created,
+        "failed": failed,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "recipes_per_second": round(created / elapsed, 2) if elapsed else 0,
+    }
@@ -0,0 +1,139 @@
+from rest_framework import serializers
+
+"""
+File used to apply JSON Patch (RFC 6902) documents to a recipe, so clients
+can edit a single ingredient or step without sending the whole recipe.
+
+The patch is applied to the write representation of the recipe (the shape
+RecipeSerializer accepts), and only the parts it touched are sent back
+through RecipeSerializer, whose update only writes the rows that changed.
+
+Supported paths:
+    /title, /privacy, /description, /servings      replace, test
+    /ingredients/<index>, /steps/<index>           add, replace, remove, test
+    /ingredients/-, /steps/-                       add (append)
+    /ingredients/<index>/<member>, /steps/...      replace, test
+"""
+
+RECIPE_FIELDS = ("title", "privacy", "description", "servings")
+ROW_MEMBERS = {
+    "ingredients": ("ingredient_name", "quantity", "unit_id"),
+    "steps": ("text",),
+}
+
+
+def recipe_patch_document(recipe) -> dict:
+    return {
+        **{field: getattr(recipe, field) for field in RECIPE_FIELDS},
+        "ingredients": [
+            {
+                "ingredient_name": ri.ingredient.name,
+                "quantity": ri.quantity,
+                "unit_id": ri.unit_id,
+            }
+            for ri in recipe.recipe_ingredients.select_related(
+                "ingredient"
+            ).order_by("order", "id")
+        ],
+        "steps": [
+            {"text": step.text}
+            for step in recipe.steps.order_by("order", "id")
+        ],
+    }
+
+
+def _error(number, message):
+    return serializers.ValidationError(
+        {"patch": [f"Operation {number}: {message}"]}
+    )
+
+
+def _parse_pointer(pointer, number) -> list:
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise _error(number, "path must be a JSON pointer.")
+    return [
+        token.replace("~1", "/").replace("~0", "~")
+        for token in pointer[1:].split("/")
+    ]
+
+
+def _row(value, name, number) -> dict:
+    members = ROW_MEMBERS[name]
+    if not isinstance(value, dict) or set(value) != set(members):
+        raise _error(number, f"value must have exactly {', '.join(members)}.")
+    return value
+
+
+def _index(rows, token, number, append=False) -> int:
+    if append and token == "-":
+        return len(rows)
+    if not token.isdigit() or int(token) >= len(rows) + append:
+        raise _error(number, f"index {token} is out of range.")
+    return int(token)
+
+
+def apply_recipe_patch(document: dict, operations) -> set:
+    """
+    Apply the operations to `document` (see recipe_patch_document) in
+    place, all or nothing. Returns the top-level keys they touched.
+    Raises ValidationError for operations outside the supported paths.
+    """
+    if not isinstance(operations, list):
+        raise serializers.ValidationError(
+            {"patch": ["Expected a list of operations."]}
+        )
+
+    touched = set()
+    for number, operation in enumerate(operations, start=1):
+        if not isinstance(operation, dict):
+            raise _error(number, "expected an object.")
+        op = operation.get("op")
+        tokens = _parse_pointer(operation.get("path"), number)
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise _error(number, "value is required.")
+        value = operation.get("value")
+        name = tokens[0]
+
+        if name in RECIPE_FIELDS and len(tokens) == 1:
+            if op == "test":
+                if document[name] != value:
+                    raise _error(number, "test failed.")
+                continue
+            if op != "replace":
+                raise _error(number, f"{op} is not supported on {name}.")
+            document[name] = value
+        elif name in ROW_MEMBERS and len(tokens) == 2:
+            rows = document[name]
+            if op == "add":
+                index = _index(rows, tokens[1], number, append=True)
+                rows.insert(index, _row(value, name, number))
+            elif op == "replace":
+                rows[_index(rows, tokens[1], number)] = _row(
+                    value, name, number
+                )
+            elif op == "remove":
+                del rows[_index(rows, tokens[1], number)]
+            elif op == "test":
+                if rows[_index(rows, tokens[1], number)] != value:
+                    raise _error(number, "test failed.")
+                continue
+            else:
+                raise _error(number, f"unsupported op {op!r}.")
+        elif (
+            name in ROW_MEMBERS
+            and len(tokens) == 3
+            and tokens[2] in ROW_MEMBERS[name]
+        ):
+            row = document[name][_index(document[name], tokens[1], number)]
+            if op == "test":
+                if row[tokens[2]] != value:
+                    raise _error(number, "test failed.")
+                continue
+            if op != "replace":
+                raise _error(number, f"{op} is not supported on a member.")
+            row[tokens[2]] = value
+        else:
+            raise _error(number, f"unsupported path {operation['path']}.")
+        touched.add(name)
+
+    return touched
@@ -2,25 +2,46 @@ import logging
 import re
 from decimal import Decimal
 
-import nltk
-import spacy
 from django.db import transaction
 
 from recipes.constants import recipe_ingredient_keywords, recipe_step_keywords
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Step, Unit
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Step
+from recipes.response_cache import bump_recipe_versions
+from recipes.utils.ingredient_index import ingredient_index
+from recipes.utils.ingredient_normalization import normalize_parsed_recipes
+from recipes.utils.quantity_parsing import QUANTITY_PATTERN, parse_quantity
+from recipes.utils.unit_conversion import unit_conversion_table
+from recipes.utils.unit_lexicon import unit_lexicon
 
-nlp = spacy.load("en_core_web_sm")
-
-
-nltk.download("punkt_tab")
 logger = logging.getLogger(__name__)
 
+ingredients_pattern = re.compile(
+    r"|".join([re.escape(k) for k in recipe_ingredient_keywords]), re.I
+)
+steps_pattern = re.compile(
+    r"|".join([re.escape(k) for k in recipe_step_keywords]), re.I
+)
+
+# Section headers are short lines that start with a keyword ("Ingredients
+# for 4") or end with a colon ("Cake ingredients:"). Other lines mentioning
+# a keyword ("Whisk the dry ingredients") are part of a step or description.
+MAX_HEADER_WORDS = 6
+
+
+def _is_header(line: str, pattern) -> bool:
+    line = line.strip()
+    match = pattern.search(line)
+    return (
+        match is not None
+        and len(line.split()) <= MAX_HEADER_WORDS
+        and (match.start() == 0 or line.endswith(":"))
+    )
+
 
 def merge_broken_ingredient_lines(lines):
     merged = []
     buffer = ""
 
-    quantity_pattern = re.compile(r"^\s*\d")
     modifier_pattern = re.compile(
         r"^(crushed|optional|extra|to serve|"
         r"chopped|minced|sliced|diced|grated)\b",
@@ -37,7 +58,7 @@ def merge_broken_ingredient_lines(lines):
         if not clean_line:
             continue
 
-        if quantity_pattern.match(clean_line):
+        if QUANTITY_PATTERN.match(clean_line):
             # new ingredient (starts with number)
             if buffer:
                 merged.append(buffer.strip())
@@ -62,10 +83,7 @@ def merge_broken_ingredient_lines(lines):
 
 
 def parse_ingredient_lines(ingredient_lines):
-    all_units = list(Unit.objects.all())
-    units = {u.abbreviation.lower(): u for u in all_units}
-    units.update({u.name.lower(): u for u in all_units})
-    fallback_unit = Unit.objects.filter(abbreviation="pcs").first()
+    fallback_unit = unit_lexicon.fallback_unit
     # TODO: fix some broken units not being parsed correctly
     optional_keywords = [
         "optional",
@@ -80,11 +98,6 @@ def parse_ingredient_lines(ingredient_lines):
     merged_lines = merge_broken_ingredient_lines(ingredient_lines)
     ingredients_data = []
 
-    quantity_pattern = re.compile(r"^\d+([\/\.\d]*)?")
-    number_word_pattern = re.compile(
-        r"\b(one|two|three|four|five|six|seven|eight|nine|ten)\b", re.I
-    )
-
     # The optional mode is set to True when we
     # identify optional keywords on an independent line
     optional_mode = False
@@ -107,45 +120,10 @@ def parse_ingredient_lines(ingredient_lines):
         is_optional = optional_mode
 
         # --- Extract quantity ---
-        match = quantity_pattern.match(lower_line)
-        if match:
-            q_str = match.group(0)
-            try:
-                quantity = float(eval(q_str))
-            except Exception:
-                quantity = 1.0
-            lower_line = lower_line[len(q_str) :].strip()
-        else:
-            word_match = number_word_pattern.search(lower_line)
-            if word_match:
-                word_to_num = {
-                    "one": 1,
-                    "two": 2,
-                    "three": 3,
-                    "four": 4,
-                    "five": 5,
-                    "six": 6,
-                    "seven": 7,
-                    "eight": 8,
-                    "nine": 9,
-                    "ten": 10,
-                }
-                quantity = word_to_num[word_match.group(1).lower()]
-                lower_line = lower_line.replace(
-                    word_match.group(0), ""
-                ).strip()
-            else:
-                quantity = 1.0
+        quantity, lower_line = parse_quantity(lower_line)
 
         # --- Detect unit ---
-        unit = None
-        for key, unit_obj in units.items():
-            if re.search(rf"\b{re.escape(key)}\b", lower_line):
-                unit = unit_obj
-                lower_line = re.sub(
-                    rf"\b{re.escape(key)}\b", "", lower_line
-                ).strip()
-                break
+        unit, lower_line = unit_lexicon.split(lower_line)
         if not unit:
             unit = fallback_unit
 
@@ -164,6 +142,37 @@ def parse_ingredient_lines(ingredient_lines):
     return ingredients_data
 
 
+def take_recipe_pages(pages) -> str:
+    """
+    Pull pages from an iterator of page texts only as far as the recipe
+    goes. Once the ingredients and steps sections have been seen, a later
+    page with a new ingredients header starts another recipe, so reading
+    stops there instead of extracting the rest of the document. Only short
+    header-like lines count, so a step such as "Whisk the dry ingredients"
+    does not end the recipe.
+    """
+    taken = []
+    found_ingredients = found_steps = False
+    for page_text in pages:
+        page_lines = page_text.splitlines()
+        if (
+            found_ingredients
+            and found_steps
+            and any(
+                _is_header(line, ingredients_pattern) for line in page_lines
+            )
+        ):
+            break
+        taken.append(page_text)
+        found_ingredients = found_ingredients or any(
+            _is_header(line, ingredients_pattern) for line in page_lines
+        )
+        found_steps = found_steps or any(
+            _is_header(line, steps_pattern) for line in page_lines
+        )
+    return "".join(taken)
+
+
 def parse_recipe_from_text(text: str, user, privacy="private") -> Recipe:
     """
     Parse raw text from a recipe file into a Recipe object and related models.
@@ -172,38 +181,43 @@ def parse_recipe_from_text(text: str, user, privacy="private") -> Recipe:
         raise ValueError("User must be provided to create recipe.")
 
     # TODO: allow selecting privacy when uploading recipe
+    return persist_recipe(parse_recipe_text(text), user, privacy)
+
+
+def parse_recipe_text(text: str, normalize: bool = True) -> dict:
+    """
+    Parse raw text from a recipe file into a JSON serializable structure,
+    without touching the recipe tables. See persist_recipe to save it.
+    When parsing many recipes, pass normalize=False and normalize all of
+    them at once with normalize_parsed_recipes.
+    """
     # Normalize text
     lines = [line.strip() for line in text.splitlines() if line.strip()]
 
-    title = lines[0] if lines else "Untitled Recipe"
-
     ingredients_idx = None
     steps_idx = None
 
-    # TODO optimize understanding recipe data, to prevent
-    #  fetching indexes based on recipe description
-    ingredients_pattern = re.compile(
-        r"|".join([re.escape(k) for k in recipe_ingredient_keywords]), re.I
-    )
-    steps_pattern = re.compile(
-        r"|".join([re.escape(k) for k in recipe_step_keywords]), re.I
-    )
-
+    # Only header-like lines count, so a description or step mentioning
+    # the ingredients does not start a section
     for i, line in enumerate(lines):
-        if ingredients_pattern.search(line) and not ingredients_idx:
-            ingredients_idx = i
-        if steps_pattern.search(line) and not steps_idx:
+        if ingredients_idx is None:
+            if _is_header(line, ingredients_pattern):
+                ingredients_idx = i
+        elif steps_idx is None and _is_header(line, steps_pattern):
             steps_idx = i
 
     if ingredients_idx is None:
         raise ValueError("No 'Ingredients' section found in text.")
 
+    # A segment can start right at the ingredients header
+    title = lines[0] if ingredients_idx > 0 else "Untitled Recipe"
+
     description_lines = []
     if ingredients_idx > 1:
         description_lines = lines[1:ingredients_idx]
     description = " ".join(description_lines)
 
-    if steps_idx:
+    if steps_idx is not None:
         ingredient_lines = lines[ingredients_idx + 1 : steps_idx]
         step_lines = lines[steps_idx + 1 :]
     else:
@@ -211,7 +225,7 @@ def parse_recipe_from_text(text: str, user, privacy="private") -> Recipe:
         step_lines = []
 
     ingredients_data = parse_ingredient_lines(ingredient_lines)
-    print("Ingredients data", ingredients_data)
+    logger.debug(f"Ingredients data {ingredients_data}")
 
     steps = []
     for i, line in enumerate(step_lines):
@@ -222,60 +236,119 @@ def parse_recipe_from_text(text: str, user, privacy="private") -> Recipe:
         else:
             steps.append(line)
 
+    parsed = {
+        "title": title.strip(),
+        "description": description.strip(),
+        "ingredients": [
+            {
+                "name": ing["name"].lower(),
+                "quantity": float(ing["quantity"]),
+                "unit_id": ing["unit"].pk if ing["unit"] else None,
+                "is_optional": ing["is_optional"],
+            }
+            for ing in ingredients_data
+        ],
+        "steps": steps,
+    }
+    if normalize:
+        normalize_parsed_recipes([parsed])
+    return parsed
+
+
+def get_or_create_ingredients(names) -> dict:
+    """
+    Resolve ingredient names to Ingredient objects with a constant number
+    of queries: one lookup, one conflict-tolerant bulk insert for the
+    missing names and one lookup to fetch their ids.
+    Returns: {name: Ingredient}
+    """
+    names = set(names)
+    ingredients = {
+        i.name: i for i in Ingredient.objects.filter(name__in=names)
+    }
+    missing = names - ingredients.keys()
+    if missing:
+        # Another upload may insert the same names concurrently
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        created = {
+            i.name: i for i in Ingredient.objects.filter(name__in=missing)
+        }
+        ingredients.update(created)
+        # bulk_create sends no signals
+        transaction.on_commit(lambda: ingredient_index.add(created.values()))
+    return ingredients
+
+
+def persist_recipe(parsed: dict, user, privacy="private") -> Recipe:
+    """
+    Save a recipe produced by parse_recipe_text, with its ingredients and
+    steps, using set-based queries so the query count does not grow with
+    the recipe length.
+    """
+    return persist_recipes([parsed], user, privacy)[0]
+
+
+def persist_recipes(parsed_recipes, user, privacy="private") -> list:
+    """
+    Save many parsed recipes in one transaction, with the same constant
+    number of queries as a single recipe.
+    """
+    parsed_recipes = list(parsed_recipes)
     with transaction.atomic():
-        recipe = Recipe.objects.create(
-            title=title.strip(),
-            description=description.strip(),
-            privacy=privacy,
-            servings=1,
-            user=user,
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    title=parsed["title"],
+                    description=parsed["description"],
+                    privacy=privacy,
+                    servings=1,
+                    user=user,
+                )
+                for parsed in parsed_recipes
+            ]
         )
 
-        for ing in ingredients_data:
-            ingredient, _ = Ingredient.objects.get_or_create(
-                name=ing["name"].lower()
-            )
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                quantity=ing["quantity"],
-                unit=ing["unit"],
-                is_optional=ing["is_optional"],
-            )
+        ingredients = get_or_create_ingredients(
+            ing["name"]
+            for parsed in parsed_recipes
+            for ing in parsed["ingredients"]
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[ing["name"]],
+                    quantity=ing["quantity"],
+                    unit_id=ing["unit_id"],
+                    is_optional=ing["is_optional"],
+                    order=order,
+                )
+                for recipe, parsed in zip(recipes, parsed_recipes)
+                for order, ing in enumerate(parsed["ingredients"], start=1)
+            ]
+        )
 
-        for idx, step_text in enumerate(steps, start=1):
-            Step.objects.create(recipe=recipe, order=idx, text=step_text)
+        Step.objects.bulk_create(
+            [
+                Step(recipe=recipe, order=idx, text=step_text)
+                for recipe, parsed in zip(recipes, parsed_recipes)
+                for idx, step_text in enumerate(parsed["steps"], start=1)
+            ]
+        )
+        # bulk_create sends no signals
+        bump_recipe_versions(recipe.pk for recipe in recipes)
 
-    return recipe
+    return recipes
 
 
 def convert_unit(quantity, from_unit, to_system):
     """
     Convert a quantity from one unit to another system (metric/imperial).
     Returns: (converted_quantity, target_unit_abbreviation)
+    Uses the process-wide conversion table, so no queries are issued once
+    the table is loaded.
     """
-    # Exclude category "count"
-    if from_unit.category not in ["weight", "volume"]:
-        return quantity, from_unit.abbreviation
-
-    # Get all units in the same category
-    category_units = Unit.objects.filter(category=from_unit.category)
-
-    # Find the target system base
-    to_units = category_units.filter(system=to_system)
-    if not to_units.exists():
-        return quantity, from_unit.abbreviation
-
-    # Try to find a "base" target unit, or fallback to the first
-    to_unit = to_units.filter(is_base_unit=True).first() or to_units.first()
-    base_quantity = quantity * from_unit.base_conversion_factor
-    converted_quantity = base_quantity / to_unit.base_conversion_factor
-
-    # Round neatly: 0 decimals if whole number, else 1 decimal
-    converted_quantity = (
-        round(converted_quantity, 1)
-        if converted_quantity % 1
-        else int(converted_quantity)
-    )
-
-    return converted_quantity, to_unit.abbreviation
+    return unit_conversion_table.convert(quantity, from_unit, to_system)
@@ -0,0 +1,60 @@
+from django.db.models import Avg, Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe, RecipeIngredient, RecipeRating
+
+"""
+File used to build Recipe querysets fitted to the fields a serializer
+will actually read (see serializers.SparseFieldsetMixin), so list
+endpoints only load the columns, aggregates and related rows they send.
+"""
+
+RECIPE_COLUMNS = {field.name for field in Recipe._meta.concrete_fields}
+
+# Subqueries rather than joins, so they don't multiply the rows counted by
+# other annotations (e.g. matching_ingredients in recipe_recommendation)
+INGREDIENT_COUNT = Coalesce(
+    Subquery(
+        RecipeIngredient.objects.filter(recipe=OuterRef("pk"))
+        .values("recipe")
+        .annotate(count=Count("id"))
+        .values("count")
+    ),
+    0,
+)
+AVG_RATING = Subquery(
+    RecipeRating.objects.filter(recipe=OuterRef("pk"))
+    .values("recipe")
+    .annotate(avg=Avg("rating"))
+    .values("avg")
+)
+
+
+def ingredients_prefetch() -> Prefetch:
+    return Prefetch(
+        "recipe_ingredients",
+        queryset=RecipeIngredient.objects.select_related("ingredient", "unit"),
+    )
+
+
+def recipes_for_fields(
+    queryset, fields, extra_columns=(), with_ingredients=False, prefetch=True
+):
+    """
+    Narrow a Recipe queryset to the serializer fields in `fields`: only()
+    the requested columns (plus `extra_columns`, e.g. for ordering),
+    annotate ingredient_count / avg_rating and prefetch ingredients and
+    steps only when asked for. Pass prefetch=False for
+    FastRecipeSummarySerializer, which reads them itself.
+    """
+    columns = [field for field in fields if field in RECIPE_COLUMNS]
+    queryset = queryset.only("id", *extra_columns, *columns)
+    if "ingredient_count" in fields:
+        queryset = queryset.annotate(ingredient_count=INGREDIENT_COUNT)
+    if "avg_rating" in fields:
+        queryset = queryset.annotate(avg_rating=AVG_RATING)
+    if with_ingredients or (prefetch and "ingredients" in fields):
+        queryset = queryset.prefetch_related(ingredients_prefetch())
+    if prefetch and "steps" in fields:
+        queryset = queryset.prefetch_related("steps")
+    return queryset
@@ -0,0 +1,91 @@
+import re
+from typing import Iterable, Iterator
+
+from recipes.utils.ingredient_normalization import normalize_parsed_recipes
+from recipes.utils.recipe_processing import (
+    _is_header,
+    ingredients_pattern,
+    logger,
+    parse_recipe_text,
+    steps_pattern,
+)
+
+"""
+File used to keep logic related to splitting a document holding several
+recipes (e.g. a cookbook) into one text per recipe.
+"""
+
+step_number_pattern = re.compile(r"^\d+[\).]")
+
+NORMALIZE_BATCH_SIZE = 50
+
+
+def segment_recipes(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Walk the text of a document once, chunk by chunk, and yield the text of
+    each recipe as soon as the next one starts.
+    A recipe ends when an ingredients header shows up after a steps
+    header. The lines before that header (title and description of the
+    next recipe) are taken from the tail of the previous steps: every line
+    after the last numbered step, or only the last line when the steps are
+    not numbered.
+    """
+    current = []
+    # Lines after the last numbered step, candidates for the next preamble
+    pending = []
+    seen_ingredients = seen_steps = numbered_steps = False
+
+    for chunk in chunks:
+        for raw_line in chunk.splitlines():
+            line = raw_line.strip()
+            if not line:
+                continue
+
+            if seen_steps and _is_header(line, ingredients_pattern):
+                preamble = pending if numbered_steps else pending[-1:]
+                yield "\n".join(current[: len(current) - len(preamble)])
+                current = list(preamble)
+                pending = []
+                seen_steps = numbered_steps = False
+
+            current.append(line)
+
+            if _is_header(line, ingredients_pattern):
+                seen_ingredients = True
+            elif seen_ingredients and _is_header(line, steps_pattern):
+                seen_steps = True
+                pending = []
+            elif seen_steps:
+                if step_number_pattern.match(line):
+                    numbered_steps = True
+                    pending = []
+                else:
+                    pending.append(line)
+
+    if current:
+        yield "\n".join(current)
+
+
+def _normalized(batch: list, normalize: bool) -> list:
+    return normalize_parsed_recipes(batch) if normalize else batch
+
+
+def parse_recipe_segments(
+    chunks: Iterable[str], normalize: bool = True
+) -> Iterator[dict]:
+    """
+    Parse every recipe found in a document, skipping segments that do not
+    look like a recipe. Ingredient names are normalized a batch of recipes
+    at a time, unless `normalize` is False.
+    """
+    batch = []
+    for index, segment in enumerate(segment_recipes(chunks), start=1):
+        try:
+            batch.append(parse_recipe_text(segment, normalize=False))
+        except ValueError as exc:
+            logger.warning(f"Skipping recipe segment {index}: {exc}")
+        if len(batch) >= NORMALIZE_BATCH_SIZE:
+            yield from _normalized(batch, normalize)
+            batch = []
+    if batch:
+        yield from _normalized(batch, normalize)
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from recipes.models import Unit
+
+"""
+File used to keep an in-memory unit conversion table.
+
+The table is built from the Unit rows once per process and kept until a
+Unit is saved or deleted (see recipes.signals), so converting the
+ingredients of a whole response does not touch the database. Signals only
+reach the process that made the change, so the table is also rebuilt
+after UNIT_CACHE_MAX_AGE_SECONDS for units changed by other processes.
+"""
+
+logger = logging.getLogger(__name__)
+
+CONVERTIBLE_CATEGORIES = ("weight", "volume")
+
+
+class UnitConversionTable:
+    """
+    Conversion matrix: category -> system -> target unit, plus the
+    precomputed factor from every convertible unit to each system.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._targets = None
+        self._factors = None
+        self._built_at = None
+
+    def _build(self):
+        units_by_key = {}
+        for unit in Unit.objects.filter(
+            category__in=CONVERTIBLE_CATEGORIES
+        ).order_by("pk"):
+            units_by_key.setdefault((unit.category, unit.system), []).append(
+                unit
+            )
+
+        # Prefer the base unit of the target system, else the first one
+        targets = {
+            key: next((u for u in units if u.is_base_unit), units[0])
+            for key, units in units_by_key.items()
+        }
+
+        factors = {}
+        for (category, system), target in targets.items():
+            for (unit_category, _), units in units_by_key.items():
+                if unit_category != category:
+                    continue
+                for unit in units:
+                    factors[(unit.pk, system)] = (
+                        unit.base_conversion_factor
+                        / target.base_conversion_factor,
+                        target.abbreviation,
+                    )
+
+        logger.info(
+            f"Built unit conversion table with {len(factors)} factors."
+        )
+        return targets, factors
+
+    def _ensure_loaded(self):
+        factors = self._factors
+        max_age = settings.UNIT_CACHE_MAX_AGE_SECONDS
+        if factors is not None and time.monotonic() - self._built_at < max_age:
+            return self._targets, factors
+        with self._lock:
+            if (
+                self._factors is None
+                or time.monotonic() - self._built_at >= max_age
+            ):
+                self._targets, self._factors = self._build()
+                self._built_at = time.monotonic()
+            return self._targets, self._factors
+
+    def invalidate(self):
+        with self._lock:
+            self._targets = None
+            self._factors = None
+
+    def convert(self, quantity, from_unit, to_system):
+        """
+        Convert a quantity from one unit to another system (metric/imperial).
+        Returns: (converted_quantity, target_unit_abbreviation)
+        """
+        if from_unit.category not in CONVERTIBLE_CATEGORIES:
+            return quantity, from_unit.abbreviation
+
+        targets, factors = self._ensure_loaded()
+        conversion = factors.get((from_unit.pk, to_system))
+        if conversion is None:
+            # Unit not known to this process yet, use the target directly
+            target = targets.get((from_unit.category, to_system))
+            if target is None:
+                return quantity, from_unit.abbreviation
+            conversion = (
+                from_unit.base_conversion_factor
+                / target.base_conversion_factor,
+                target.abbreviation,
+            )
+
+        factor, abbreviation = conversion
+        converted_quantity = quantity * factor
+
+        # Round neatly: 0 decimals if whole number, else 1 decimal
+        converted_quantity = (
+            round(converted_quantity, 1)
+            if converted_quantity % 1
+            else int(converted_quantity)
+        )
+        return converted_quantity, abbreviation
+
+
+unit_conversion_table = UnitConversionTable()
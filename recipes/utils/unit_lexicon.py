@@ -0,0 +1,102 @@
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from recipes.constants import UNIT_SYNONYMS
+from recipes.models import Unit
+
+"""
+File used to keep the compiled unit lexicon used when parsing ingredient
+lines.
+
+Every unit abbreviation, name and synonym is compiled into a single
+alternation regex sorted longest-first, so finding the unit of a line is
+one scan regardless of how many units exist. The lexicon is built once
+per process and rebuilt after a Unit is saved or deleted
+(see recipes.signals), or after UNIT_CACHE_MAX_AGE_SECONDS for units
+changed by other processes.
+"""
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_UNIT_ABBREVIATION = "pcs"
+
+
+class UnitLexicon:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._built_at = None
+
+    def _build(self):
+        units = list(Unit.objects.all())
+        by_abbreviation = {u.abbreviation.lower(): u for u in units}
+
+        lookup = {}
+        for unit in units:
+            lookup.setdefault(unit.abbreviation.lower(), unit)
+            lookup.setdefault(unit.name.lower(), unit)
+        for abbreviation, synonyms in UNIT_SYNONYMS.items():
+            unit = by_abbreviation.get(abbreviation)
+            if unit is None:
+                continue
+            for synonym in synonyms:
+                lookup.setdefault(synonym.lower(), unit)
+
+        # Longest first, so "tablespoons" wins over "tablespoon" and "tbsp"
+        keys = sorted(lookup, key=lambda k: (-len(k), k))
+        pattern = (
+            re.compile(r"\b(" + "|".join(re.escape(k) for k in keys) + r")\b")
+            if keys
+            else None
+        )
+        fallback = by_abbreviation.get(FALLBACK_UNIT_ABBREVIATION)
+
+        logger.info(f"Built unit lexicon with {len(keys)} entries.")
+        return pattern, lookup, fallback
+
+    def _ensure_loaded(self):
+        compiled = self._compiled
+        max_age = settings.UNIT_CACHE_MAX_AGE_SECONDS
+        if (
+            compiled is not None
+            and time.monotonic() - self._built_at < max_age
+        ):
+            return compiled
+        with self._lock:
+            if (
+                self._compiled is None
+                or time.monotonic() - self._built_at >= max_age
+            ):
+                self._compiled = self._build()
+                self._built_at = time.monotonic()
+            return self._compiled
+
+    def invalidate(self):
+        with self._lock:
+            self._compiled = None
+
+    @property
+    def fallback_unit(self):
+        return self._ensure_loaded()[2]
+
+    def split(self, text: str):
+        """
+        Find the first (longest) unit mentioned in a lowercased ingredient
+        line.
+        Returns: (unit or None, text with the unit removed)
+        """
+        pattern, lookup, _ = self._ensure_loaded()
+        if pattern is None:
+            return None, text
+        match = pattern.search(text)
+        if not match:
+            return None, text
+        rest = text[: match.start()] + text[match.end() :]
+        return lookup[match.group(1)], " ".join(rest.split())
+
+
+unit_lexicon = UnitLexicon()
@@ -1,28 +1,60 @@
-import os
-
-from django.db.models import Avg
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.http import StreamingHttpResponse
 from rest_framework import generics, status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticated,
+)
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import UserRateThrottle
 from rest_framework.views import APIView
 
+from .conditional_get import (
+    ListConditionalGetMixin,
+    ObjectConditionalGetMixin,
+)
 from .models import (
-    Ingredient,
+    ArchiveImportJob,
     Recipe,
     RecipePrivacyChoices,
     RecipeRating,
     Unit,
+    UploadedFile,
+    UploadJob,
+    UploadJobStatusChoices,
+)
+from .pagination import CreatedAtCursorPagination
+from .parsers import JSONPatchParser
+from .response_cache import (
+    GLOBAL_VERSION_KEY,
+    PUBLIC_LIST_VERSION_KEY,
+    VersionedResponseCacheMixin,
+    recipe_version_key,
+    response_cache_stats,
 )
 from .serializers import (
-    IngredientAutocompleteSerializer,
+    ArchiveImportJobSerializer,
+    FastRecipeSummarySerializer,
+    RecipeArchiveUploadSerializer,
     RecipeRatingSerializer,
     RecipeReadSerializer,
     RecipeSerializer,
+    RecipeSummarySerializer,
     RecipeUploadSerializer,
     UnitSerializer,
+    UploadJobSerializer,
 )
-from .utils.file_extraction import extract_text_from_file
-from .utils.recipe_processing import parse_recipe_from_text
+from .tasks import process_archive_import_job, process_upload_job
+from .utils.file_extraction import file_sha256
+from .utils.ingredient_index import ingredient_index
+from .utils.recipe_export import stream_recipes_csv, stream_recipes_ndjson
+from .utils.recipe_import import import_recipe_lines
+from .utils.recipe_patch import apply_recipe_patch, recipe_patch_document
+from .utils.recipe_queries import recipes_for_fields
 from .utils.recipe_recommendation import (
     filter_recipes_by_ingredients,
     get_recipes_based_on_users_with_similar_preferences,
@@ -30,27 +62,66 @@ from .utils.recipe_recommendation import (
 )
 
 
-class RecipeListView(generics.ListCreateAPIView):
+class RecipeListView(ListConditionalGetMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = RecipeSerializer
 
-    def get_queryset(self):
+    def get_serializer_class(self):
+        if self.request.method == "GET":
+            return FastRecipeSummarySerializer
+        return RecipeSerializer
+
+    def get_base_queryset(self):
         return Recipe.objects.filter(user=self.request.user)
 
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        if self.request.method != "GET":
+            return queryset
+        return recipes_for_fields(
+            queryset,
+            RecipeSummarySerializer.requested_fields(self.request),
+            prefetch=False,
+        )
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class PublicRecipeListView(generics.ListAPIView):
+class PublicRecipeListView(
+    VersionedResponseCacheMixin,
+    ListConditionalGetMixin,
+    generics.ListAPIView,
+):
     permission_classes = [AllowAny]
-    serializer_class = RecipeReadSerializer
-    queryset = Recipe.objects.filter(privacy=RecipePrivacyChoices.PUBLIC)
+    serializer_class = FastRecipeSummarySerializer
+    pagination_class = CreatedAtCursorPagination
+    response_cache_name = "public_recipe_list"
+    response_cache_query_params = ("fields", "expand", "cursor", "page_size")
+
+    def get_base_queryset(self):
+        return Recipe.objects.filter(privacy=RecipePrivacyChoices.PUBLIC)
+
+    def get_queryset(self):
+        # A page is one query, plus one per expanded ingredients/steps
+        return recipes_for_fields(
+            self.get_base_queryset(),
+            RecipeSummarySerializer.requested_fields(self.request),
+            extra_columns=["created_at"],
+            prefetch=False,
+        )
+
+    def get_response_cache_version_keys(self):
+        return [GLOBAL_VERSION_KEY, PUBLIC_LIST_VERSION_KEY]
 
 
-class RecipeDetailUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
+class RecipeDetailUpdateDeleteView(
+    ObjectConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     permission_classes = [IsAuthenticated]
     queryset = Recipe.objects.all()
 
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, JSONPatchParser]
+
     def get_serializer_class(self):
         if self.request.method == "GET":
             return RecipeReadSerializer
@@ -61,10 +132,37 @@ class RecipeDetailUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
         context["system"] = self.request.query_params.get("system", "metric")
         return context
 
+    def patch(self, request, *args, **kwargs):
+        if request.content_type.split(";")[0] != JSONPatchParser.media_type:
+            return super().patch(request, *args, **kwargs)
+
+        # JSON Patch: edit single ingredients or steps by index
+        instance = self.get_object()
+        document = recipe_patch_document(instance)
+        touched = apply_recipe_patch(document, request.data)
+        serializer = self.get_serializer(
+            instance,
+            data={name: document[name] for name in touched},
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
 
-class RecipeDetailReadOnlyView(generics.RetrieveAPIView):
-    queryset = Recipe.objects.all()
+class RecipeDetailReadOnlyView(
+    VersionedResponseCacheMixin,
+    ObjectConditionalGetMixin,
+    generics.RetrieveAPIView,
+):
+    permission_classes = [AllowAny]
+    queryset = Recipe.objects.filter(privacy=RecipePrivacyChoices.PUBLIC)
     serializer_class = RecipeReadSerializer
+    response_cache_name = "public_recipe_detail"
+    response_cache_query_params = ("system", "fields", "expand")
+
+    def get_response_cache_version_keys(self):
+        return [GLOBAL_VERSION_KEY, recipe_version_key(self.kwargs["pk"])]
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -72,12 +170,28 @@ class RecipeDetailReadOnlyView(generics.RetrieveAPIView):
         return context
 
 
-class IngredientAutocompleteView(generics.ListAPIView):
-    serializer_class = IngredientAutocompleteSerializer
+class IngredientAutocompleteThrottle(UserRateThrottle):
+    scope = "ingredient_autocomplete"
 
-    def get_queryset(self):
-        q = self.request.query_params.get("q", "")
-        return Ingredient.objects.filter(name__icontains=q)[:5]
+
+class IngredientAutocompleteView(APIView):
+    """
+    Suggest ingredients from the in-memory index (see
+    recipes.utils.ingredient_index) rather than an icontains scan per
+    keystroke. The index holds the ingredients of private recipes too, so
+    it is only open to signed-in users, who are rate limited.
+    """
+
+    throttle_classes = [IngredientAutocompleteThrottle]
+
+    def get(self, request):
+        q = request.query_params.get("q", "")
+        return Response(
+            [
+                {"id": pk, "name": name}
+                for pk, name in ingredient_index.search(q, limit=5)
+            ]
+        )
 
 
 class RecipeUploadView(generics.CreateAPIView):
@@ -87,26 +201,162 @@ class RecipeUploadView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        multiple_recipes = serializer.validated_data.pop("multiple_recipes")
+
+        # Identical files are stored once and their extracted text and
+        # parse result are reused by the job
+        digest = file_sha256(serializer.validated_data["file"])
+        uploaded_file = UploadedFile.objects.filter(sha256=digest).first()
+        if uploaded_file is None:
+            uploaded_file = serializer.save(sha256=digest)
+
+        # Extraction and parsing run in a background job, the client polls
+        # UploadJobDetailView for the outcome.
+        job = UploadJob.objects.create(
+            user=self.request.user,
+            uploaded_file=uploaded_file,
+            multiple_recipes=multiple_recipes,
+        )
+        transaction.on_commit(lambda: process_upload_job.delay(job.pk))
+        job.refresh_from_db()
 
-        uploaded_file = serializer.validated_data["file"]
-        ext = os.path.splitext(uploaded_file.name)[1].lower()
+        return Response(
+            UploadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+        )
 
-        try:
-            extracted_text = extract_text_from_file(uploaded_file, ext)
-            print("Extracted Text:\n", extracted_text[:1000])
-            recipe = parse_recipe_from_text(extracted_text, self.request.user)
 
+class RecipeArchiveUploadView(generics.CreateAPIView):
+    serializer_class = RecipeArchiveUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # The archive is imported in a background job, the client polls
+        # ArchiveImportJobDetailView for the per-file report.
+        job = ArchiveImportJob.objects.create(
+            user=self.request.user,
+            archive=serializer.validated_data["file"],
+        )
+        transaction.on_commit(lambda: process_archive_import_job.delay(job.pk))
+        job.refresh_from_db()
+
+        return Response(
+            ArchiveImportJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class RecipeImportView(APIView):
+    """
+    Bulk import of newline-delimited JSON recipes (application/x-ndjson),
+    read line by line from the request body rather than parsed whole.
+    ?batch_size= sets how many recipes are saved per transaction.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        batch_size = request.query_params.get(
+            "batch_size", settings.RECIPE_IMPORT_BATCH_SIZE
+        )
+        try:
+            batch_size = int(batch_size)
+        except ValueError:
+            batch_size = 0
+        if not 0 < batch_size <= settings.RECIPE_IMPORT_MAX_BATCH_SIZE:
             return Response(
                 {
-                    "message": "File processed and recipe created.",
-                    "recipe": RecipeSerializer(recipe).data,
+                    "error": "batch_size must be between 1 and "
+                    f"{settings.RECIPE_IMPORT_MAX_BATCH_SIZE}."
                 },
-                status=status.HTTP_201_CREATED,
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        except Exception as exc:
+
+        # request.data would read the whole body; the stream is None when
+        # the body is empty
+        report = import_recipe_lines(
+            request.stream or [], request.user, batch_size
+        )
+        return Response(report, status=status.HTTP_201_CREATED)
+
+
+class RecipeExportView(APIView):
+    """
+    Stream all of the user's recipes as export/ndjson/ or export/csv/. The
+    body is produced chunk by chunk while it is sent.
+    """
+
+    permission_classes = [IsAuthenticated]
+    streams = {
+        "ndjson": (stream_recipes_ndjson, "application/x-ndjson"),
+        "csv": (stream_recipes_csv, "text/csv"),
+    }
+
+    def get(self, request, file_format):
+        if file_format not in self.streams:
             return Response(
-                {"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST
+                {"error": "Export as ndjson or csv."},
+                status=status.HTTP_404_NOT_FOUND,
             )
+        stream, content_type = self.streams[file_format]
+        response = StreamingHttpResponse(
+            stream(
+                Recipe.objects.filter(user=request.user),
+                settings.RECIPE_EXPORT_CHUNK_SIZE,
+            ),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="recipes.{file_format}"'
+        )
+        return response
+
+
+class UploadJobDetailView(generics.RetrieveAPIView):
+    serializer_class = UploadJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadJob.objects.filter(user=self.request.user)
+
+
+class ArchiveImportJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ArchiveImportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ArchiveImportJob.objects.filter(user=self.request.user)
+
+
+class UploadCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        stats = UploadJob.objects.filter(
+            status=UploadJobStatusChoices.DONE
+        ).aggregate(
+            hits=Count("id", filter=Q(cache_hit=True)),
+            misses=Count("id", filter=Q(cache_hit=False)),
+        )
+        total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / total if total else 0
+        return Response(stats)
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            response_cache_stats(
+                [
+                    PublicRecipeListView.response_cache_name,
+                    RecipeDetailReadOnlyView.response_cache_name,
+                ]
+            )
+        )
 
 
 class UnitListView(generics.ListAPIView):
@@ -148,14 +398,23 @@ class RecommendRecipesDBView(APIView):
             qs = qs.filter(created_by__username__icontains=creator)
 
         qs = qs.distinct()
+        fields = RecipeSummarySerializer.requested_fields(request)
 
         if num_choices is not None and current_user:
             qs = get_recipes_based_on_users_with_similar_preferences(
                 qs, current_user
             )
+            # surprise_recipes scores every recipe by its ingredients
+            qs = recipes_for_fields(
+                qs, fields, with_ingredients=True, prefetch=False
+            )
             qs = surprise_recipes(qs, ingredient_names, num_choices)
+        else:
+            qs = recipes_for_fields(qs, fields, prefetch=False)
 
-        serializer = RecipeReadSerializer(qs, many=True)
+        serializer = FastRecipeSummarySerializer(
+            qs, many=True, context={"request": request}
+        )
         return Response(serializer.data)
 
 